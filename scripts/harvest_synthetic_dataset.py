@@ -1,5 +1,11 @@
+import hashlib
+import itertools
 import json
+import os
+import posixpath
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import re
 
@@ -172,6 +178,18 @@ def generate_episode(title, season, episode):
 
     return entries
 
+def tag_release(entries, tag):
+    """Append " [tag]" to the release's own path component, below the top-level folder.
+
+    That is the release folder (scene, clean, organized) or the file itself (flat), so clutter moves along with it.
+    """
+    for e in entries:
+        parts = e["relativePath"].split("/")
+        stem, ext = posixpath.splitext(parts[1]) if len(parts) == 2 else (parts[1], "")
+        parts[1] = f"{stem} [{tag}]{ext}"
+        e["relativePath"] = "/".join(parts)
+    return entries
+
 def harvest(count=5000, output_path=None):
     entries = []
     all_titles = TITLES + EVIL_TITLES
@@ -195,12 +213,82 @@ def harvest(count=5000, output_path=None):
     
     print(f"Successfully harvested {len(entries)} entries to {final_path}")
 
+SHARD_ENTRIES = 50000  # entries per generation shard; fixed so the output doesn't depend on the worker count
+
+def shard_seed(seed, shard):
+    return int.from_bytes(hashlib.sha256(f"{seed}:{shard}".encode("utf-8")).digest()[:8], "big")
+
+def generate_shard(job):
+    """One shard: JSONL bytes for `count` entries drawn with the shard's own seed.
+
+    The factories draw from small pools and repeat paths, so each release is tagged with its shard and the index of
+    its first line, which makes every relativePath unique without tracking the ones already written.
+    """
+    seed, shard, count = job
+    # The factories draw from the module-level generator; each worker process reseeds it per shard
+    random.seed(shard_seed(seed, shard))
+    all_titles = TITLES + EVIL_TITLES
+    lines = []
+    while len(lines) < count:
+        if random.random() > 0.4:
+            entries = generate_movie(random.choice(all_titles), random.choice(YEARS))
+        else:
+            entries = generate_episode(random.choice(all_titles), random.randint(1, 10), random.randint(1, 24))
+        for e in tag_release(entries, f"s{shard}-{len(lines)}"):
+            lines.append(json.dumps(e, ensure_ascii=False) + "\n")
+    return "".join(lines[:count]).encode("utf-8")
+
+def generate(output_path, entries=None, total_bytes=None, seed=42, workers=None):
+    """Stream a JSONL corpus of `entries` lines or about `total_bytes` bytes (whole lines), identical for a given seed.
+
+    Paths are unique by construction (see generate_shard), so memory stays flat at any size.
+    """
+    if entries is None and total_bytes is None:
+        raise ValueError("generate() needs entries or total_bytes")
+    workers = workers or os.cpu_count() or 1
+    written_entries = written_bytes = 0
+
+    def jobs():
+        shard = 0
+        while True:
+            remaining = entries - shard * SHARD_ENTRIES if entries is not None else SHARD_ENTRIES
+            if remaining <= 0: return
+            yield seed, shard, min(SHARD_ENTRIES, remaining)
+            shard += 1
+
+    start = time.perf_counter()
+    pending = jobs()
+    with open(output_path, "wb") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        # A bounded window of shards in flight keeps memory flat; results are written in shard order
+        window = [pool.submit(generate_shard, job) for job in itertools.islice(pending, workers * 2)]
+        while window:
+            chunk = window.pop(0).result()
+            if total_bytes is not None and written_bytes + len(chunk) >= total_bytes:
+                chunk = chunk[:chunk.rfind(b"\n", 0, total_bytes - written_bytes) + 1]
+                for future in window: future.cancel()
+                window, pending = [], iter(())
+            f.write(chunk)
+            written_bytes += len(chunk)
+            written_entries += chunk.count(b"\n")
+            window.extend(pool.submit(generate_shard, job) for job in itertools.islice(pending, 1))
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {written_entries} entries ({written_bytes / 1024**2:.1f}MB) to {output_path} in {elapsed:.1f}s")
+
 if __name__ == "__main__":
-    import sys
-    count = 5000
-    out = None
-    if len(sys.argv) > 1:
-        count = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        out = sys.argv[2]
-    harvest(count, out)
+    import argparse
+    parser = argparse.ArgumentParser(description="Synthetic dirty filename dataset")
+    parser.add_argument("count", nargs="?", type=int, default=5000, help="Releases to generate (each adds clutter entries); in JSONL mode, exact entries")
+    parser.add_argument("output", nargs="?", help="Output path (default: datasets/regression/tier-b-synthetic-dirty.json)")
+    parser.add_argument("--jsonl", action="store_true", help="Stream JSONL from worker processes instead of one JSON manifest (implied by a .jsonl output)")
+    parser.add_argument("--bytes", help="JSONL mode: stop at about this output size instead, e.g. 500M or 2G")
+    parser.add_argument("--seed", type=int, default=42, help="JSONL mode: seed; the same seed gives the same file")
+    parser.add_argument("--workers", type=int, help="JSONL mode: generator processes (default: CPU count)")
+    args = parser.parse_args()
+    if args.jsonl or (args.output or "").endswith(".jsonl"):
+        from sizes import parse_size
+        total_bytes = parse_size(args.bytes) if args.bytes else None
+        generate(args.output or "datasets/regression/tier-b-synthetic-dirty.jsonl", None if total_bytes else args.count,
+                 total_bytes, args.seed, args.workers)
+    else:
+        harvest(args.count, args.output)
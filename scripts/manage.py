@@ -1,16 +1,33 @@
 #!/usr/bin/env python3
 import argparse
+import base64
+import email.utils
+import hashlib
+import http.client
+import itertools
 import json
+import math
 import os
 import random
+import select
 import shutil
+import socket
+import ssl
+import struct
 import subprocess
 import sys
+import threading
 import time
+import urllib.parse
 import urllib.request
 import urllib.error
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
 
+from sizes import parse_size
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = REPO_ROOT / "data"
 MEDIA_DIR = DATA_DIR / "media"
@@ -27,14 +44,136 @@ def run_command(cmd, cwd=REPO_ROOT, env=None):
         print(f"Error: command failed with exit code {e.returncode}")
         sys.exit(e.returncode)
 
-def call_api(path, method="GET", body=None, args=None):
+try:
+    import brotli  # optional: lets the server answer with br as well as gzip
+except ImportError:
+    brotli = None
+
+READ_CHUNK = 64 * 1024
+LONG_RUNNING = None  # timeout for calls that run a whole scan or plan server-side
+
+def retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value: return None
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError): return None
+
+class ApiClient:
+    """Keep-alive connection pool shared by every API call, with compressed responses, retries and per-call timing."""
+
+    def __init__(self, retries=3, backoff=0.25, timeout=60):
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.trace = False
+        self.pools = {}
+        self.lock = threading.Lock()
+        # Running totals for the --trace summary; per-call rows would grow without bound on long polls
+        self.calls = self.retried = 0
+        self.total_ms = self.total_bytes = self.total_wire = 0
+
+    def connection(self, key, timeout):
+        with self.lock:
+            idle = self.pools.get(key)
+            while idle:
+                conn = idle.pop()
+                # A readable idle socket means the server closed it (or sent junk): don't send on it
+                if not conn.sock or select.select([conn.sock], [], [], 0)[0]:
+                    conn.close()
+                    continue
+                conn.sock.settimeout(timeout)
+                return conn, True
+        scheme, netloc = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(netloc, timeout=timeout), False
+
+    def release(self, key, conn):
+        with self.lock:
+            self.pools.setdefault(key, []).append(conn)
+
+    def read_body(self, response):
+        """Decompress the body chunk by chunk as it arrives; returns (bytes, bytes on the wire)."""
+        encoding = (response.getheader("Content-Encoding") or "").lower()
+        if encoding == "gzip": decode = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+        elif encoding == "deflate": decode = zlib.decompressobj().decompress
+        elif encoding == "br" and brotli: decode = brotli.Decompressor().process
+        else: decode = None
+        chunks, wire = [], 0
+        while True:
+            chunk = response.read(READ_CHUNK)
+            if not chunk: break
+            wire += len(chunk)
+            chunks.append(decode(chunk) if decode else chunk)
+        return b"".join(chunks), wire
+
+    def request(self, method, url, body=None, headers=None, timeout=-1):
+        """Send one request and return (status, body bytes); raises once retries are exhausted."""
+        timeout = self.timeout if timeout == -1 else timeout
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        headers = {**(headers or {}), "Accept-Encoding": "br, gzip" if brotli else "gzip"}
+        # Idempotent calls are retried on 5xx and network errors. A POST is repeated only when it never left
+        # (the connect failed) or the server explicitly asked for a retry with 503 + Retry-After
+        idempotent = method in ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+        attempt = 0
+        while True:
+            conn, reused = self.connection(key, timeout)
+            start = time.perf_counter()
+            sent = False
+            wait = None
+            try:
+                if not conn.sock: conn.connect()
+                sent = True
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                payload, wire = self.read_body(response)
+            except (TimeoutError, OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.record(method, path, type(e).__name__, time.perf_counter() - start, 0, 0, None, reused, attempt)
+                if (not idempotent and sent) or attempt >= self.retries: raise
+            else:
+                if response.will_close: conn.close()
+                else: self.release(key, conn)
+                self.record(method, path, response.status, time.perf_counter() - start, len(payload), wire,
+                            response.getheader("Content-Encoding"), reused, attempt)
+                wait = retry_after(response.getheader("Retry-After"))
+                retry = idempotent and response.status >= 500 or response.status == 503 and wait is not None
+                if not retry or attempt >= self.retries:
+                    return response.status, payload
+            attempt += 1
+            # Full jitter: a random wait up to an exponentially growing cap, unless the server named a delay
+            time.sleep(wait if wait is not None else random.uniform(0, self.backoff * 2 ** attempt))
+
+    def record(self, method, path, status, elapsed, size, wire, encoding, reused, attempt):
+        with self.lock:
+            self.calls += 1
+            self.retried += attempt > 0
+            self.total_ms += elapsed * 1000
+            self.total_bytes += size
+            self.total_wire += wire
+        if self.trace:
+            print(f"[trace] {method} {path} -> {status} in {elapsed * 1000:.1f}ms, {size / 1024:.1f}KB"
+                  + (f" ({encoding} {wire / 1024:.1f}KB)" if encoding else "") + (" reused" if reused else " new connection")
+                  + (f" retry {attempt}" if attempt else ""), file=sys.stderr)
+
+    def summary(self):
+        if not self.calls: return
+        print(f"[trace] {self.calls} calls ({self.retried} retries), {self.total_ms:.0f}ms, {self.total_bytes / 1024:.1f}KB decoded, "
+              f"{self.total_wire / 1024:.1f}KB on the wire", file=sys.stderr)
+
+CLIENT = ApiClient()
+
+def call_api(path, method="GET", body=None, args=None, timeout=-1):
     """Call Shirarium API."""
-    resp = call_jf_api(f"shirarium/{path}", method=method, body=body, args=args)
+    resp = call_jf_api(f"shirarium/{path}", method=method, body=body, args=args, timeout=timeout)
     if resp:
         print(json.dumps(resp, indent=2))
     return resp
 
-def call_jf_api(path, method="GET", body=None, args=None, token=None):
+def call_jf_api(path, method="GET", body=None, args=None, token=None, timeout=-1):
     """Call Jellyfin API."""
     url = f"{args.url.rstrip('/')}/{path}"
     
@@ -57,18 +196,21 @@ def call_jf_api(path, method="GET", body=None, args=None, token=None):
     else:
         data = None
     
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
-    
     try:
-        with urllib.request.urlopen(req) as f:
-            content = f.read().decode("utf-8")
-            if not content:
-                return {}
-            return json.loads(content)
-    except urllib.error.HTTPError as e:
+        status, content = CLIENT.request(method, url, body=data, headers=headers, timeout=timeout)
+    except Exception as e:
+        print(f"Warning: {method} {path} failed: {e}", file=sys.stderr)
+        return None
+    if status >= 500:
+        print(f"Warning: {method} {path} returned {status}", file=sys.stderr)
+    if status >= 400:
         # Silently fail for expected errors during probing
         return None
-    except Exception as e:
+    if not content:
+        return {}
+    try:
+        return json.loads(content)
+    except ValueError:
         return None
 
 def cmd_login(args):
@@ -242,51 +384,207 @@ def cmd_scan(args):
 
     task_id = scan_task["Id"]
     print(f"Triggering library scan (Task: {task_id})...")
+    args.since = time.time()
     call_jf_api(f"ScheduledTasks/Running/{task_id}", method="POST", args=args)
     
     if getattr(args, "wait", False):
         cmd_wait_for_scan(args)
 
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class WebSocket:
+    """Minimal RFC 6455 client (text frames, ping/pong, close) for Jellyfin's /socket session messages."""
+
+    def __init__(self, url, timeout=10):
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "wss" else 80)
+        sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+        if parts.scheme == "wss":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+        self.sock = sock
+        self.buffer = b""
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        while b"\r\n\r\n" not in self.buffer:
+            self.fill()
+        head, self.buffer = self.buffer.split(b"\r\n\r\n", 1)
+        lines = head.decode("latin-1").split("\r\n")
+        if " 101 " not in lines[0] + " ":
+            raise ConnectionError(f"WebSocket upgrade refused: {lines[0]}")
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(":") for line in lines[1:])}
+        expected = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        if headers.get("sec-websocket-accept") != expected:
+            raise ConnectionError("WebSocket handshake failed")
+
+    def fill(self):
+        chunk = self.sock.recv(65536)
+        if not chunk: raise ConnectionError("WebSocket closed")
+        self.buffer += chunk
+
+    def read(self, n):
+        while len(self.buffer) < n:
+            self.fill()
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        return data
+
+    def send(self, payload, opcode=1):
+        if isinstance(payload, str): payload = payload.encode("utf-8")
+        n = len(payload)
+        if n < 126: header = struct.pack(">BB", 0x80 | opcode, 0x80 | n)
+        elif n < 65536: header = struct.pack(">BBH", 0x80 | opcode, 0x80 | 126, n)
+        else: header = struct.pack(">BBQ", 0x80 | opcode, 0x80 | 127, n)
+        # Client frames must be masked
+        mask = os.urandom(4)
+        self.sock.sendall(header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+    def recv(self, timeout):
+        """Next text message, or None when nothing arrives within `timeout` seconds."""
+        message = b""
+        while True:
+            pending = self.buffer or (isinstance(self.sock, ssl.SSLSocket) and self.sock.pending())
+            if not message and not pending and not select.select([self.sock], [], [], timeout)[0]:
+                return None
+            first, second = self.read(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126: length = struct.unpack(">H", self.read(2))[0]
+            elif length == 127: length = struct.unpack(">Q", self.read(8))[0]
+            mask = self.read(4) if second & 0x80 else None
+            payload = self.read(length)
+            if mask: payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            if opcode == 8: raise ConnectionError("WebSocket closed by server")
+            if opcode == 9:
+                self.send(payload, opcode=10)
+                continue
+            if opcode in (0, 1, 2):
+                message += payload
+                if first & 0x80: return message.decode("utf-8")
+
+    def close(self):
+        try: self.send(b"", opcode=8)
+        except OSError: pass
+        self.sock.close()
+
+def parse_utc(value):
+    try: return datetime.fromisoformat(value).timestamp() if value else None
+    except ValueError: return None
+
+def task_finished(task, started, progress, label):
+    """Print progress; True once the task ran and went idle, or stayed idle well past the trigger."""
+    state = task.get("State", "Idle")
+    if state == "Running":
+        pct = task.get("CurrentProgressPercentage") or 0
+        if pct != progress.get("pct"):
+            print(f"{label} in progress: {pct:.1f}%")
+            progress["pct"] = pct
+        progress["running"] = True
+        return False
+    if state != "Idle": return False
+    # A run that ended after we started waiting counts even if we never saw it running
+    ended = parse_utc((task.get("LastExecutionResult") or {}).get("EndTimeUtc"))
+    if progress.get("running") or (ended and ended >= started - 2):
+        print(f"{label} complete: 100%")
+        return True
+    # If we just started and it's idle, give it a few seconds to actually start
+    if time.time() - started < 10: return False
+    print(f"{label} is idle (finished or not started).")
+    return True
+
+SOCKET_QUIET = 10  # seconds without a push before re-reading the task over REST
+
+def watch_task_socket(args, token, task_id, started, label, timeout):
+    """Follow the task through Jellyfin's ScheduledTasksInfo pushes; raises TimeoutError if it isn't done in time."""
+    fetch = lambda: call_jf_api(f"ScheduledTasks/{task_id}", args=args)
+    progress = {}
+    # Jellyfin only pushes on changes and the scan may already be over: start from the current state
+    last_task = fetch()
+    if last_task and task_finished(last_task, started, progress, label): return True
+    parts = urllib.parse.urlsplit(args.url)
+    query = urllib.parse.urlencode({"api_key": token or "", "deviceId": "shirarium-cli"})
+    ws = WebSocket(f"{'wss' if parts.scheme == 'https' else 'ws'}://{parts.netloc}{parts.path.rstrip('/')}/socket?{query}")
+    deadline = time.time() + timeout
+    try:
+        ws.send(json.dumps({"MessageType": "ScheduledTasksInfoStart", "Data": "0,1000"}))
+        keepalive, last_sent, last_push = 30, time.time(), time.time()
+        while True:
+            if time.time() > deadline:
+                raise TimeoutError(f"{label} not finished after {timeout:g}s of WebSocket updates")
+            if time.time() - last_sent > keepalive / 2:
+                ws.send(json.dumps({"MessageType": "KeepAlive"}))
+                last_sent = time.time()
+            text = ws.recv(timeout=1.0)
+            if text is None:
+                if time.time() - last_push > SOCKET_QUIET:
+                    last_task = fetch() or last_task
+                    last_push = time.time()
+                if last_task and task_finished(last_task, started, progress, label): return True
+                continue
+            message = json.loads(text)
+            kind = message.get("MessageType")
+            if kind == "ForceKeepAlive":
+                keepalive = message.get("Data") or keepalive
+            elif kind == "ScheduledTasksInfo":
+                task = next((t for t in message.get("Data") or [] if t.get("Id") == task_id), None)
+                if task:
+                    last_task, last_push = task, time.time()
+                    if task_finished(task, started, progress, label): return True
+    finally:
+        try: ws.send(json.dumps({"MessageType": "ScheduledTasksInfoStop"}))
+        except OSError: pass
+        ws.close()
+
+def poll_with_backoff(fetch, done, fast=0.25, slow=5.0):
+    """Call fetch() until done(result) is true: quickly while things change, backing off while they don't."""
+    delay, previous = fast, None
+    while True:
+        result = fetch()
+        if result is not None and done(result): return result
+        delay = fast if result is not None and result != previous else min(delay * 1.5, slow)
+        previous = result
+        time.sleep(delay)
+
+def poll_task(args, task_id, started, label):
+    """Fallback: poll the single task (not the whole task list), with adaptive backoff."""
+    progress = {}
+    def fetch():
+        task = call_jf_api(f"ScheduledTasks/{task_id}", args=args)
+        if task is None: print("Warning: Could not retrieve task, retrying...")
+        return task
+    poll_with_backoff(fetch, lambda task: task_finished(task, started, progress, label))
+    return True
+
 def cmd_wait_for_scan(args):
-    """Poll Jellyfin for library scan progress."""
+    """Wait for a Jellyfin library scan (pushed over the session WebSocket) or a Shirarium scan/plan run."""
+    if not getattr(args, "token", None):
+        args.token = get_saved_token()
+    target = getattr(args, "target", "library")
+    started = getattr(args, "since", None) or time.time()
+
+    if target in ("scan", "plan"):
+        # Shirarium runs inside their API call; a finished run shows up as a newer snapshot in ops-status
+        section = "Scan" if target == "scan" else "Plan"
+        print(f"Waiting for a Shirarium {target} newer than {time.strftime('%H:%M:%S', time.localtime(started))}...")
+        status = poll_with_backoff(lambda: call_jf_api("shirarium/ops-status", args=args),
+                                   lambda s: (parse_utc((s.get(section) or {}).get("GeneratedAtUtc")) or 0) >= started, fast=0.5)
+        print(f"Shirarium {target} finished at {status[section]['GeneratedAtUtc']}")
+        return
+
     print("Waiting for library scan to start...")
-    
-    import time
-    last_pct = -1
-    start_time = time.time()
-    
-    while True:
-        tasks = call_jf_api("ScheduledTasks", args=args)
-        if not tasks:
-            print("Warning: Could not retrieve tasks, retrying...")
-            time.sleep(2)
-            continue
-            
-        scan_task = next((t for t in tasks if t.get("Key") == "RefreshLibrary"), None)
-        if not scan_task:
-            print("Error: Library scan task not found.")
+    tasks = call_jf_api("ScheduledTasks", args=args)
+    scan_task = next((t for t in tasks or [] if t.get("Key") == "RefreshLibrary"), None)
+    if not scan_task:
+        print("Error: Library scan task not found.")
+        return
+    if not getattr(args, "poll", False):
+        try:
+            watch_task_socket(args, args.token, scan_task["Id"], started, "Scan", getattr(args, "timeout", None) or 600)
             return
-
-        state = scan_task.get("State", "Idle")
-        progress = scan_task.get("CurrentProgressPercentage", 0)
-        
-        if state == "Running":
-            if progress != last_pct:
-                print(f"Scan in progress: {progress:.1f}%")
-                last_pct = progress
-        elif state == "Idle":
-            # If we just started and it's idle, give it a few seconds to actually start
-            if last_pct == -1 and time.time() - start_time < 10:
-                time.sleep(1)
-                continue
-                
-            if last_pct != -1:
-                print("Scan complete: 100%")
-            else:
-                print("Scan is idle (finished or not started).")
-            break
-            
-        time.sleep(2)
+        except TimeoutError as e:
+            print(f"{e}; polling the task instead.")
+        except (OSError, ConnectionError, ValueError) as e:
+            print(f"WebSocket unavailable ({e}); polling the task instead.")
+    poll_task(args, scan_task["Id"], started, "Scan")
 
 def cmd_up(args):
     """Start the dev environment."""
@@ -330,6 +628,38 @@ def cmd_test(args):
         cmd = ["dotnet", "test", str(REPO_ROOT / "tests" / "Jellyfin.Plugin.Shirarium.Tests" / "Jellyfin.Plugin.Shirarium.Tests.csproj"), "-c", "Release"]
     run_command(cmd)
 
+VIDEO_EXTS = {".mkv", ".mp4", ".avi", ".mov"}
+SPARSE_HEADER = 4096  # bytes of the golden sample kept at the start of a sparse file (one filesystem block)
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, XFS, bcachefs)
+
+def parse_size_range(text):
+    """'2G' or '700M-4G'."""
+    low, _, high = text.partition("-")
+    return parse_size(low), parse_size(high or low)
+
+def apparent_size(rel_path, size_range):
+    # Stable per path, so re-seeding with --force leaves matching files alone
+    low, high = size_range
+    return low + zlib.crc32(rel_path.encode("utf-8")) % (high - low + 1)
+
+def place_sample(sample, target, mode):
+    """Expose a golden sample at `target`: hardlink or reflink when asked for, copying when the filesystem can't."""
+    if mode == "hardlink":
+        try:
+            os.link(sample, target)
+            return
+        except OSError: pass
+    elif mode == "reflink":
+        try:
+            import fcntl
+            with open(sample, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except (OSError, ImportError):
+            try: target.unlink()
+            except OSError: pass
+    shutil.copyfile(sample, target)
+
 def cmd_seed(args):
     """Seed the media directory with realistic-looking synthetic files."""
     dataset_path = Path(args.dataset)
@@ -341,9 +671,12 @@ def cmd_seed(args):
 
     print(f"Seeding media from {dataset_path}...")
     with open(dataset_path, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
+        # JSON manifests ({"entries": [...]}) or JSONL corpora from harvest_synthetic_dataset.py, one entry per line
+        if dataset_path.suffix == ".jsonl":
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f).get("entries", [])
 
-    entries = manifest.get("entries", [])
     target_root = MEDIA_DIR
     target_root.mkdir(parents=True, exist_ok=True)
 
@@ -393,47 +726,77 @@ def cmd_seed(args):
         ".srt": "1\n00:00:01,000 --> 00:00:04,000\nShirarium Test Subtitle\n\n2\n00:00:05,000 --> 00:00:08,000\nSynthetic Media for Development",
     }
 
-    count = 0
+    # Unique target paths (later entries win), then every directory in one pass instead of a mkdir per file
+    jobs = {}
     for entry in entries:
         rel_path = entry.get("relativePath")
         if not rel_path: continue
         rel_path = rel_path.replace("\\", "/")
-        full_path = target_root / rel_path
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        if full_path.exists() and not args.force:
-            continue
+        jobs[rel_path] = entry
+    for folder in sorted({(target_root / rel_path).parent for rel_path in jobs}):
+        folder.mkdir(parents=True, exist_ok=True)
+
+    samples = {".mkv": sample_mkv if sample_mkv.exists() else None, ".mp4": sample_mp4 if sample_mp4.exists() else None}
+    apparent = parse_size_range(args.apparent_size) if args.mode == "sparse" else None
+    headers = {ext: sample.read_bytes()[:SPARSE_HEADER] for ext, sample in samples.items() if sample} if apparent else {}
 
+    def seed_one(rel_path, entry):
+        """Write one file; returns True when it was (re)written, False when it was already up to date."""
+        full_path = target_root / rel_path
         ext = full_path.suffix.lower()
         template = EXT_TEMPLATES.get(ext)
         expected = entry.get("expected") or {}
+        sample = samples.get(ext)
+        exists = full_path.exists()
+        if exists and not args.force:
+            return False
 
-        try:
-            if ext == ".mkv" and sample_mkv.exists():
-                shutil.copy(sample_mkv, full_path)
-            elif ext == ".mp4" and sample_mp4.exists():
-                shutil.copy(sample_mp4, full_path)
-            elif isinstance(template, bytes):
-                with open(full_path, "wb") as f:
-                    f.write(template)
-                    # Add some random padding to make the file look "non-empty" to basic probes
-                    f.write(os.urandom(1024))
-            else:
-                content = template if template else f"Shirarium synthetic file\nSource: {rel_path}"
-                if "{title}" in content:
-                    content = content.format(
-                        title=expected.get("title", "Unknown"), 
-                        year=expected.get("year", ""),
-                        resolution=expected.get("resolution", "Unknown"),
-                        codec=expected.get("codec", "Unknown")
-                    )
-                with open(full_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-            count += 1
-        except Exception as e:
-            print(f"Warning: Failed to seed {rel_path}: {e}")
+        if ext in VIDEO_EXTS and args.mode == "sparse":
+            # Real header bytes, then a hole up to the apparent size: TB-scale libraries in a few MB of disk
+            size = apparent_size(rel_path, apparent)
+            if exists and full_path.stat().st_size == size: return False
+            header = headers.get(ext) or template
+            with open(full_path, "wb") as f:
+                f.write(header)
+                f.truncate(max(size, len(header)))
+        elif sample is not None:
+            if exists and args.mode == "hardlink" and os.path.samefile(sample, full_path): return False
+            if exists and args.mode != "hardlink" and full_path.stat().st_size == sample.stat().st_size and not full_path.samefile(sample): return False
+            if exists: full_path.unlink()
+            place_sample(sample, full_path, args.mode)
+        elif isinstance(template, bytes):
+            if exists and full_path.stat().st_size == len(template) + 1024: return False
+            with open(full_path, "wb") as f:
+                f.write(template)
+                # Add some random padding to make the file look "non-empty" to basic probes
+                f.write(os.urandom(1024))
+        else:
+            content = template if template else f"Shirarium synthetic file\nSource: {rel_path}"
+            if "{title}" in content:
+                content = content.format(
+                    title=expected.get("title", "Unknown"), 
+                    year=expected.get("year", ""),
+                    resolution=expected.get("resolution", "Unknown"),
+                    codec=expected.get("codec", "Unknown")
+                )
+            if exists and full_path.read_text(encoding="utf-8", errors="replace") == content: return False
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(content)
+        return True
+
+    count = skipped = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(seed_one, rel_path, entry): rel_path for rel_path, entry in jobs.items()}
+        for future in as_completed(futures):
+            try:
+                if future.result(): count += 1
+                else: skipped += 1
+            except Exception as e:
+                print(f"Warning: Failed to seed {futures[future]}: {e}")
 
-    print(f"Seeded {count} files to {target_root}")
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {count} files to {target_root} in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} files/s, {skipped} already up to date, mode: {args.mode})")
 
 def cmd_benchmark_setup(args):
     """Download large datasets for benchmarking."""
@@ -476,9 +839,9 @@ def cmd_api(args):
         args.token = get_saved_token()
     
     if args.api_command == "scan":
-        call_api("scan", method="POST", args=args)
+        call_api("scan", method="POST", args=args, timeout=LONG_RUNNING)
     elif args.api_command == "plan":
-        call_api("plan-organize", method="POST", args=args)
+        call_api("plan-organize", method="POST", args=args, timeout=LONG_RUNNING)
     elif args.api_command == "status":
         call_api("ops-status", args=args)
     elif args.api_command == "suggestions":
@@ -523,10 +886,158 @@ def cmd_bench(args):
         cmd.extend(["--binary", args.binary])
     if args.ngl is not None:
         cmd.extend(["--ngl", str(args.ngl)])
+    if args.concurrency > 1:
+        cmd.extend(["--concurrency", str(args.concurrency)])
     run_command(cmd)
 
+def cmd_compare(args):
+    """Compare two ShirariumBench JSON reports; exits non-zero on a significant regression."""
+    runner = REPO_ROOT / "shirariumbench" / "runner.py"
+    cmd = [sys.executable, str(runner), "--compare", args.baseline]
+    if args.candidate:
+        cmd.append(args.candidate)
+    cmd.extend(["--tolerance", str(args.tolerance), "--acc-tolerance", str(args.acc_tolerance)])
+    run_command(cmd)
+
+def container_rss(container):
+    """Current and peak RSS (bytes) of the container's main process (Jellyfin runs as PID 1)."""
+    try:
+        result = subprocess.run(["docker", "exec", container, "cat", "/proc/1/status"], capture_output=True, text=True, timeout=10)
+        fields = dict(line.split(":", 1) for line in result.stdout.splitlines() if ":" in line)
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except Exception:
+        return None, None
+
+def timed_phase(label, container, fn):
+    """Run one phase while sampling Jellyfin's RSS; returns (result, wall seconds, peak RSS bytes)."""
+    samples = []
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            rss, _ = container_rss(container)
+            if rss: samples.append(rss)
+            done.wait(1.0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    print(f"  {label}...")
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        wall = time.perf_counter() - start
+        done.set()
+        sampler.join()
+    print(f"  {label}: {wall:.1f}s")
+    return result, wall, max(samples) if samples else None
+
+def media_file_count():
+    """Files under data/media, leaving out the golden samples and .gitkeep."""
+    count = 0
+    for root, _, names in os.walk(MEDIA_DIR):
+        top = Path(root) == MEDIA_DIR
+        count += sum(1 for name in names if not (top and (name == ".gitkeep" or name.startswith(".sample."))))
+    return count
+
+def cmd_scale_bench(args):
+    """Seed libraries of increasing size and time Jellyfin's library scan, Shirarium's scan and plan at each size."""
+    from harvest_synthetic_dataset import generate
+    if not args.token:
+        args.token = get_saved_token()
+    if not args.token:
+        print("Error: No token provided. Use 'login' first or provide --token.")
+        sys.exit(1)
+
+    container = "shirarium-jellyfin-prod" if args.prod else "shirarium-jellyfin-dev"
+    # Jellyfin's DataPath is /config/data inside the container
+    plugin_data = DATA_DIR / ("jellyfin-prod" if args.prod else "jellyfin") / "config" / "data" / "plugins" / "Shirarium"
+    out_dir = Path(args.output) if args.output else DATA_DIR / "scale-bench"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sizes = sorted(set(args.sizes))
+
+    # One seeded corpus; each size seeds a prefix of it, so every library is a superset of the previous one
+    corpus_path = out_dir / f"corpus-{args.seed}-{sizes[-1]}.jsonl"
+    if not corpus_path.exists():
+        generate(corpus_path, sizes[-1], seed=args.seed)
+
+    def snapshot_bytes(name):
+        path = plugin_data / name
+        return path.stat().st_size if path.exists() else None
+
+    points = []
+    for step, size in enumerate(sizes):
+        print(f"\n=== Library size {size} ===")
+        dataset_path = out_dir / f"library-{size}.jsonl"
+        with open(corpus_path, "r", encoding="utf-8") as src, open(dataset_path, "w", encoding="utf-8") as dst:
+            dst.writelines(itertools.islice(src, size))
+        seed_args = argparse.Namespace(dataset=str(dataset_path), clean=step == 0 and args.clean, force=False,
+                                       mode=args.seed_mode, apparent_size=args.apparent_size, workers=args.workers)
+        _, seed_s, _ = timed_phase("Seeding", container, lambda: cmd_seed(seed_args))
+        # What the scans actually see: repeated corpus paths, failed writes or media kept from before change it
+        files = media_file_count()
+        if files != size: print(f"  Library holds {files} files (requested {size})")
+
+        point = {"size": size, "files": files, "seed_s": seed_s}
+        if not args.skip_library_scan:
+            scan_args = argparse.Namespace(url=args.url, token=args.token, wait=True)
+            _, point["library_s"], point["library_rss_peak"] = timed_phase("Jellyfin library scan", container, lambda: cmd_scan(scan_args))
+        scan, point["scan_s"], point["scan_rss_peak"] = timed_phase("Shirarium scan", container, lambda: call_jf_api("shirarium/scan", method="POST", args=args, timeout=LONG_RUNNING))
+        if scan is None:
+            print("Error: Shirarium scan failed; stopping.")
+            break
+        plan, point["plan_s"], point["plan_rss_peak"] = timed_phase("Shirarium plan", container, lambda: call_jf_api("shirarium/plan-organize", method="POST", args=args, timeout=LONG_RUNNING))
+        if plan is None:
+            print("Error: Shirarium plan failed; stopping.")
+            break
+
+        status = call_jf_api("shirarium/ops-status", args=args) or {}
+        scan_status, plan_status = status.get("Scan") or {}, status.get("Plan") or {}
+        point.update(
+            scan_files_per_s=files / point["scan_s"] if point["scan_s"] else None,
+            plan_files_per_s=files / point["plan_s"] if point["plan_s"] else None,
+            examined=scan_status.get("ExaminedCount"), candidates=scan_status.get("CandidateCount"),
+            suggestions=scan_status.get("SuggestionCount"), parse_failures=scan_status.get("ParseFailureCount"),
+            planned=plan_status.get("PlannedCount"), conflicts=plan_status.get("ConflictCount"),
+            scan_snapshot_bytes=snapshot_bytes("dryrun-suggestions.json"), plan_snapshot_bytes=snapshot_bytes("organization-plan.json"),
+        )
+        point["rss"], point["rss_hwm"] = container_rss(container)
+        points.append(point)
+        print(f"  Scan {point['scan_files_per_s'] or 0:.0f} files/s, plan {point['plan_files_per_s'] or 0:.0f} files/s, "
+              f"{point['suggestions']} suggestions, {point['planned']} planned")
+
+    # Local scaling exponent between consecutive sizes: 1.0 is linear, 2.0 quadratic
+    for prev, cur in zip(points, points[1:]):
+        for phase in ("library_s", "scan_s", "plan_s"):
+            if prev.get(phase) and cur.get(phase) and cur["files"] != prev["files"]:
+                cur[phase.replace("_s", "_exponent")] = math.log(cur[phase] / prev[phase]) / math.log(cur["files"] / prev["files"])
+
+    stamp = int(time.time())
+    report = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "url": args.url, "container": container, "seed": args.seed, "points": points}
+    json_path = out_dir / f"scale_{stamp}.json"
+    json_path.write_text(json.dumps(report, indent=2))
+
+    def num(v, fmt):
+        return format(v, fmt) if v is not None else "-"
+
+    def mb(v):
+        return f"{v / 1024**2:.0f}MB" if v else "-"
+
+    lines = ["# Shirarium Scale Benchmark", "", f"- **Date**: {report['date']}", f"- **Server**: {args.url} (`{container}`)", f"- **Corpus seed**: {args.seed}", "",
+             "| Requested | Files | Library Scan | Scan | Scan files/s | Scan exp. | Plan | Plan files/s | Plan exp. | Suggestions | Planned | Scan Snapshot | Plan Snapshot | Peak RSS |",
+             "| :--- " * 14 + "|"]
+    for p in points:
+        peak = max((v for v in (p.get("library_rss_peak"), p["scan_rss_peak"], p["plan_rss_peak"]) if v), default=None)
+        lines.append(f"| {p['size']} | {p['files']} | {num(p.get('library_s'), '.1f') + 's' if p.get('library_s') is not None else '-'} | {p['scan_s']:.1f}s | {num(p['scan_files_per_s'], '.0f')} | {num(p.get('scan_exponent'), '.2f')} | "
+                     f"{p['plan_s']:.1f}s | {num(p['plan_files_per_s'], '.0f')} | {num(p.get('plan_exponent'), '.2f')} | {num(p['suggestions'], 'd')} | {num(p['planned'], 'd')} | "
+                     f"{mb(p['scan_snapshot_bytes'])} | {mb(p['plan_snapshot_bytes'])} | {mb(peak)} |")
+    md_path = json_path.with_suffix(".md")
+    md_path.write_text("\n".join(lines) + "\n")
+    print(f"\nScaling curve saved to: {md_path} and {json_path}")
+
 def main():
     parser = argparse.ArgumentParser(description="Shirarium Developer CLI")
+    parser.add_argument("--trace", action="store_true", help="Print timing, size and compression of every API call")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # up
@@ -548,9 +1059,13 @@ def main():
 
     # seed
     p_seed = subparsers.add_parser("seed", help="Seed media data")
-    p_seed.add_argument("--dataset", default="datasets/regression/tier-b-synthetic.json", help="Path to JSON dataset")
+    p_seed.add_argument("--dataset", default="datasets/regression/tier-b-synthetic.json", help="Path to JSON dataset or JSONL corpus")
     p_seed.add_argument("--clean", action="store_true", help="Clean media dir before seeding")
-    p_seed.add_argument("--force", action="store_true", help="Overwrite existing files")
+    p_seed.add_argument("--force", action="store_true", help="Rewrite existing files that differ from what this seeding would write")
+    p_seed.add_argument("--mode", choices=["copy", "hardlink", "reflink", "sparse"], default="copy",
+                        help="How video files get the golden sample: copy, hardlink or reflink it (copy fallback), or sparse files of --apparent-size")
+    p_seed.add_argument("--apparent-size", default="1G-4G", help="Sparse mode: apparent video size or LO-HI range, e.g. 2G or 700M-8G")
+    p_seed.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4), help="Files written in parallel")
     p_seed.set_defaults(func=cmd_seed)
 
     # benchmark-setup
@@ -565,8 +1080,32 @@ def main():
     p_bench.add_argument("--limit", type=int, default=0, help="Limit number of items to test (0 for all)")
     p_bench.add_argument("--binary", help="Path to llama-server binary")
     p_bench.add_argument("--ngl", type=int, default=99, help="Number of GPU layers (0 to disable)")
+    p_bench.add_argument("--concurrency", type=int, default=1, help="Requests kept in flight per model")
     p_bench.set_defaults(func=cmd_bench)
 
+    # compare
+    p_compare = subparsers.add_parser("compare", help="Check a benchmark report against a baseline for regressions")
+    p_compare.add_argument("baseline", help="Baseline JSON report (shirariumbench/reports/*.json)")
+    p_compare.add_argument("candidate", nargs="?", help="Candidate JSON report (default: reports/latest.json)")
+    p_compare.add_argument("--tolerance", type=float, default=0.05, help="Relative latency/throughput change to tolerate")
+    p_compare.add_argument("--acc-tolerance", type=float, default=0.005, help="Absolute accuracy drop to tolerate")
+    p_compare.set_defaults(func=cmd_compare)
+
+    # scale-bench
+    p_scale = subparsers.add_parser("scale-bench", help="Measure scan/plan wall time, files/sec and Jellyfin RSS across library sizes")
+    p_scale.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="Library sizes (files) to seed and measure")
+    p_scale.add_argument("--url", default="http://localhost:8097", help="Jellyfin URL")
+    p_scale.add_argument("--token", help="Jellyfin Admin Token (optional if logged in)")
+    p_scale.add_argument("--prod", action="store_true", help="Measure the production container")
+    p_scale.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic corpus")
+    p_scale.add_argument("--output", help="Directory for the corpus and results (default: data/scale-bench)")
+    p_scale.add_argument("--seed-mode", choices=["copy", "hardlink", "reflink", "sparse"], default="hardlink", help="How video files are seeded (see seed --mode)")
+    p_scale.add_argument("--apparent-size", default="1G-4G", help="Apparent video size for --seed-mode sparse")
+    p_scale.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4), help="Files seeded in parallel")
+    p_scale.add_argument("--clean", action="store_true", help="Wipe data/media before seeding the first size (otherwise seeds on top of it)")
+    p_scale.add_argument("--skip-library-scan", action="store_true", help="Don't run Jellyfin's library scan before each Shirarium scan")
+    p_scale.set_defaults(func=cmd_scale_bench)
+
     # clean
     p_clean = subparsers.add_parser("clean", help="Wipe Jellyfin data volumes")
     p_clean.add_argument("--prod", action="store_true", help="Wipe production data")
@@ -590,6 +1129,12 @@ def main():
     p_wait = subparsers.add_parser("wait-for-scan", help="Wait for active library scan to complete")
     p_wait.add_argument("--url", default="http://localhost:8097", help="Jellyfin URL")
     p_wait.add_argument("--token", help="Jellyfin Admin Token (optional if logged in)")
+    p_wait.add_argument("--target", choices=["library", "scan", "plan"], default="library",
+                        help="library: Jellyfin's library scan task; scan/plan: a Shirarium run finishing after --since")
+    p_wait.add_argument("--since", type=float, help="Unix time the awaited run must finish after (default: now)")
+    p_wait.add_argument("--poll", action="store_true", help="Poll the scan task instead of following WebSocket updates")
+    p_wait.add_argument("--timeout", type=float, default=600,
+                        help="Seconds to follow WebSocket updates before falling back to polling the task (default: 600)")
     p_wait.set_defaults(func=cmd_wait_for_scan)
 
     # login
@@ -637,7 +1182,11 @@ def main():
     p_api.set_defaults(func=cmd_api)
 
     args = parser.parse_args()
-    args.func(args)
+    CLIENT.trace = args.trace
+    try:
+        args.func(args)
+    finally:
+        if args.trace: CLIENT.summary()
 
 if __name__ == "__main__":
     main()
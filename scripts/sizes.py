@@ -0,0 +1,7 @@
+def parse_size(text):
+    """'700M', '1.5G', '2T' or plain bytes."""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
@@ -0,0 +1,136 @@
+import argparse
+import base64
+import hashlib
+import json
+import struct
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import manage
+
+TASK_ID = "refresh"
+
+def utc_now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S.0000000Z", time.gmtime())
+
+def text_frame(text):
+    payload = text.encode()
+    header = struct.pack(">BB", 0x81, len(payload)) if len(payload) < 126 else struct.pack(">BBH", 0x81, 126, len(payload))
+    return header + payload
+
+class StandIn(ThreadingHTTPServer):
+    """Jellyfin stand-in: GET ScheduledTasks[/id] over REST and ScheduledTasksInfo pushes on /socket.
+
+    `states` is the sequence of task states served, one per REST read or push; the last one repeats.
+    With push=False the socket upgrades but never sends anything.
+    """
+    daemon_threads = True
+
+    def __init__(self, states, push=True):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.states, self.push = list(states), push
+        self.rest_reads = 0
+        self.client_messages = []
+
+    def next_task(self):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        task = {"Id": TASK_ID, "Key": "RefreshLibrary", "State": state, "CurrentProgressPercentage": 50.0}
+        if state == "Idle": task["LastExecutionResult"] = {"EndTimeUtc": utc_now()}
+        return task
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/socket"):
+            return self.socket()
+        self.server.rest_reads += 1
+        task = self.server.next_task()
+        body = json.dumps(task if self.path.startswith(f"/ScheduledTasks/{TASK_ID}") else [task]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def socket(self):
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + manage.WS_GUID).encode()).digest())
+        self.wfile.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        self.wfile.flush()
+        self.close_connection = True
+        sock = self.connection
+        threading.Thread(target=self.read_client, args=(sock,), daemon=True).start()
+        try:
+            while True:
+                time.sleep(0.2)
+                if self.server.push:
+                    sock.sendall(text_frame(json.dumps({"MessageType": "ScheduledTasksInfo", "Data": [self.server.next_task()]})))
+        except OSError:
+            pass
+
+    def read_client(self, sock):
+        reader = sock.makefile("rb")
+        try:
+            while True:
+                first, second = reader.read(2)
+                length = second & 0x7F
+                if length == 126: length = struct.unpack(">H", reader.read(2))[0]
+                mask = reader.read(4)
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(reader.read(length)))
+                if first & 0x0F == 8:
+                    sock.close()
+                    return
+                self.server.client_messages.append(json.loads(payload))
+        except (OSError, ValueError):
+            pass
+
+class WaitForScanTest(unittest.TestCase):
+    def start(self, states, push=True):
+        server = StandIn(states, push)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def args(self, server, **extra):
+        return argparse.Namespace(url=f"http://127.0.0.1:{server.server_port}", token="token", **extra)
+
+    def test_push_updates_finish_the_wait(self):
+        server = self.start(["Running", "Running", "Running", "Idle"])
+        started = time.time()
+        self.assertTrue(manage.watch_task_socket(self.args(server), "token", TASK_ID, started, "Scan", timeout=10))
+        self.assertEqual(server.rest_reads, 1)  # only the initial state; progress came from pushes
+        kinds = [m["MessageType"] for m in server.client_messages]
+        self.assertEqual(kinds[0], "ScheduledTasksInfoStart")
+
+    def test_finished_scan_returns_without_a_push(self):
+        server = self.start(["Idle"], push=False)
+        started = time.time()
+        self.assertTrue(manage.watch_task_socket(self.args(server), "token", TASK_ID, started, "Scan", timeout=10))
+        self.assertEqual(server.rest_reads, 1)
+
+    def test_silent_socket_falls_back_to_rest(self):
+        server = self.start(["Running", "Running", "Idle"], push=False)
+        quiet, manage.SOCKET_QUIET = manage.SOCKET_QUIET, 0.5
+        self.addCleanup(setattr, manage, "SOCKET_QUIET", quiet)
+        started = time.time()
+        self.assertTrue(manage.watch_task_socket(self.args(server), "token", TASK_ID, started, "Scan", timeout=10))
+        self.assertGreaterEqual(server.rest_reads, 3)
+
+    def test_timeout_switches_to_polling(self):
+        server = self.start(["Running"] * 4 + ["Idle"], push=False)
+        args = self.args(server, target="library", poll=False, timeout=1, since=time.time())
+        manage.cmd_wait_for_scan(args)
+        self.assertGreaterEqual(server.rest_reads, 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+from itertools import islice
+from typing import Dict, Any, Iterator, TextIO, Tuple
+
+def iter_json_entries(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield the elements of a manifest's top-level "entries" array without loading the whole document."""
+    decoder = json.JSONDecoder()
+    buf, pos, in_array = "", 0, False
+    while True:
+        if not in_array:
+            start = buf.find('"entries"')
+            bracket = buf.find("[", start) if start >= 0 else -1
+            if bracket >= 0:
+                buf, pos, in_array = buf[bracket + 1:], 0, True
+                continue
+            chunk = f.read(chunk_size)
+            if not chunk: return
+            buf += chunk
+            continue
+
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Entry straddles the chunk boundary: drop what's consumed and read more
+            chunk = f.read(chunk_size)
+            if not chunk: raise
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield item
+
+def iter_dataset(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream entries from a JSON manifest ({"entries": [...]}) or a JSONL file (one entry per line)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip(): yield json.loads(line)
+        else:
+            yield from iter_json_entries(f)
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse an 'i/N' shard spec (0-based index)."""
+    index, count = (int(part) for part in spec.split("/"))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec}: expected i/N with 0 <= i < N")
+    return index, count
+
+def select_window(path: str, offset: int = 0, limit: int = 0, shard: Tuple[int, int] = (0, 1)) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (dataset index, entry) for items [offset, offset + limit) that belong to the given shard.
+
+    Shards take every N-th item of the window, so the union of all shards is exactly the unsharded run.
+    """
+    index, count = shard
+    stop = offset + limit if limit > 0 else None
+    for idx, item in enumerate(islice(iter_dataset(path), offset, stop), offset):
+        if (idx - offset) % count == index:
+            yield idx, item
@@ -0,0 +1,230 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+import requests
+from concurrent.futures import Future
+from queue import Queue
+from pathlib import Path
+from typing import Dict, Any
+
+CHUNK = 1 << 20  # bytes per read/write and per resume checkpoint step
+
+def default_cache_dir() -> Path:
+    if os.environ.get("SHIRARIUM_MODEL_CACHE"):
+        return Path(os.environ["SHIRARIUM_MODEL_CACHE"])
+    base = os.environ.get("XDG_CACHE_HOME") or (os.environ.get("LOCALAPPDATA") if os.name == 'nt' else None) or Path.home() / ".cache"
+    return Path(base) / "shirarium" / "models"
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK * 8), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def link_or_copy(source: Path, target: Path):
+    """Expose a cached blob at `target` without duplicating it: hardlink, then symlink, then copy."""
+    if target.exists() or target.is_symlink():
+        try:
+            if os.path.samefile(source, target): return
+        except OSError: pass
+        target.unlink()
+    try: os.link(source, target)
+    except OSError:
+        try: os.symlink(source.resolve(), target)
+        except OSError: shutil.copyfile(source, target)
+
+class ModelDownloader:
+    """Content-addressed GGUF cache shared by every checkout, filled by resumable parallel ranged downloads.
+
+    Layout: blobs/sha256/<digest> holds the weights, urls/<sha256(url)>.json maps a URL to its digest so
+    models without a pinned digest are still found again, and partial/ keeps in-progress downloads.
+    """
+
+    def __init__(self, cache_dir: Path = None, parts: int = 4):
+        self.cache_dir = Path(cache_dir or default_cache_dir())
+        self.parts = max(1, parts)
+        for sub in ("blobs/sha256", "urls", "partial"):
+            (self.cache_dir / sub).mkdir(parents=True, exist_ok=True)
+        self.headers = {"Authorization": f"Bearer {os.environ['HF_TOKEN']}"} if os.environ.get("HF_TOKEN") else {}
+        self.lock = threading.Lock()
+        self.inflight: Dict[str, Future] = {}
+        self.prefetch_queue = Queue()
+        self.prefetcher = None
+
+    def blob(self, digest: str) -> Path:
+        return self.cache_dir / "blobs" / "sha256" / digest
+
+    def url_index(self, url: str) -> Path:
+        return self.cache_dir / "urls" / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def cached(self, model_info: Dict[str, Any]) -> Path:
+        digest = model_info.get("sha256")
+        if not digest:
+            try: digest = json.loads(self.url_index(model_info["url"]).read_text())["sha256"]
+            except (OSError, ValueError, KeyError): return None
+        blob = self.blob(digest)
+        return blob if blob.exists() else None
+
+    def fetch(self, model_info: Dict[str, Any], target: Path, quiet: bool = False) -> Path:
+        """Make `target` the verified weights for this model, downloading into the cache only if needed.
+        Concurrent callers (a prefetch and the benchmark that needs the file) share one download."""
+        with self.lock:
+            future = self.inflight.get(model_info["url"])
+            owner = future is None
+            if owner:
+                future = self.inflight[model_info["url"]] = Future()
+        if not owner:
+            if not quiet and not future.done(): print(f"INFO: Waiting for the prefetch of {model_info['name']}...")
+            return link_target(future.result(), target)
+        try:
+            blob = self.cached(model_info) or self.adopt(model_info, target) or self.download(model_info, quiet)
+            future.set_result(blob)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock: self.inflight.pop(model_info["url"], None)
+        return link_target(blob, target)
+
+    def prefetch(self, model_info: Dict[str, Any], target: Path):
+        """Download the model in the background (one at a time) while the current one is benchmarked."""
+        if self.cached(model_info): return
+        with self.lock:
+            if self.prefetcher is None:
+                # Daemon thread: a background download never holds up exit after Ctrl-C or an error; it resumes next run
+                self.prefetcher = threading.Thread(target=self.prefetch_worker, daemon=True)
+                self.prefetcher.start()
+        self.prefetch_queue.put((model_info, target))
+
+    def prefetch_worker(self):
+        while True:
+            model_info, target = self.prefetch_queue.get()
+            try: self.fetch(model_info, target, quiet=True)
+            except Exception as e: print(f"\n!! Prefetch of {model_info['name']} failed: {e}")
+
+    def remote_digest(self, url: str) -> str:
+        """SHA-256 the Hugging Face Hub reports for an LFS file (X-Linked-Etag on the unredirected resolve URL)."""
+        response = requests.head(url, headers=self.headers, allow_redirects=False, timeout=30)
+        etag = (response.headers.get("X-Linked-Etag") or response.headers.get("ETag") or "").strip('"').removeprefix("W/").strip('"')
+        return etag if re.fullmatch(r"[0-9a-f]{64}", etag) else None
+
+    def adopt(self, model_info: Dict[str, Any], target: Path) -> Path:
+        """Move weights downloaded before the cache existed into it, if they check out.
+
+        Without a pinned digest only the size can be checked, against the server's; a truncated file is re-downloaded."""
+        if not target.exists() or target.is_symlink(): return None
+        if not model_info.get("sha256"):
+            size, _ = self.probe(model_info["url"])
+            if target.stat().st_size != size:
+                print(f"  Discarding {target.name}: " + (f"{target.stat().st_size} of {size} bytes" if size else "not pinned and its size can't be checked"))
+                return None
+        digest = file_sha256(target)
+        if model_info.get("sha256") and digest != model_info["sha256"]:
+            print(f"  Discarding {target.name}: SHA-256 mismatch")
+            return None
+        return self.store(target, digest, model_info["url"], move=False)
+
+    def store(self, path: Path, digest: str, url: str, move: bool = True) -> Path:
+        blob = self.blob(digest)
+        if not blob.exists():
+            if move: os.replace(path, blob)
+            else: link_or_copy(path, blob)
+        self.url_index(url).write_text(json.dumps({"sha256": digest, "size": blob.stat().st_size}))
+        return blob
+
+    def probe(self, url: str) -> tuple:
+        """Total size and whether the server honours byte ranges (after redirects)."""
+        try:
+            response = requests.get(url, headers={**self.headers, "Range": "bytes=0-0"}, stream=True, timeout=30, allow_redirects=True)
+            response.close()
+            if response.status_code == 206:
+                return int(response.headers["Content-Range"].rsplit("/", 1)[1]), True
+            return int(response.headers.get("Content-Length") or 0), False
+        except (requests.RequestException, KeyError, ValueError):
+            return 0, False
+
+    def download(self, model_info: Dict[str, Any], quiet: bool = False) -> Path:
+        url, name = model_info["url"], model_info["name"]
+        partial = self.cache_dir / "partial" / hashlib.sha256(url.encode("utf-8")).hexdigest()
+        state_path = partial.with_suffix(".json")
+        size, ranged = self.probe(url)
+        print(f"INFO: Downloading {name}" + (f" ({size / 1024**3:.2f}GB" + (f", {self.parts} parts)" if ranged else ")") if size else "") + ("..." if not quiet else " in the background..."))
+
+        # Resume state: bytes completed in each part, valid only for the same total size and part layout
+        parts = self.parts if ranged and size > self.parts * CHUNK else 1
+        bounds = [(i * size // parts, (i + 1) * size // parts) for i in range(parts)] if size else [(0, 0)]
+        state = {}
+        try: state = json.loads(state_path.read_text())
+        except (OSError, ValueError): pass
+        if not (state.get("size") == size and len(state.get("done", [])) == parts and partial.exists() and ranged):
+            state = {"size": size, "done": [0] * parts}
+            with open(partial, 'wb') as f:
+                if size: f.truncate(size)
+        state_lock = threading.Lock()
+
+        def save_state():
+            with state_lock: state_path.write_text(json.dumps(state))
+
+        def fetch_part(i: int):
+            start, end = bounds[i]
+            offset = start + state["done"][i]
+            if size and offset >= end: return
+            headers = dict(self.headers)
+            if ranged: headers["Range"] = f"bytes={offset}-{end - 1}"
+            try:
+                with requests.get(url, headers=headers, stream=True, timeout=60, allow_redirects=True) as response:
+                    response.raise_for_status()
+                    if ranged and response.status_code != 206:
+                        raise Exception(f"{url} ignored the byte range for part {i}")
+                    with open(partial, 'r+b') as f:
+                        f.seek(offset)
+                        for block in response.iter_content(CHUNK):
+                            f.write(block)
+                            state["done"][i] += len(block)
+                            if state["done"][i] % (CHUNK * 64) < len(block):
+                                f.flush()
+                                save_state()
+            finally:
+                save_state()  # an interrupted part resumes from its last written byte
+
+        errors = []
+        def run_part(i: int):
+            try: fetch_part(i)
+            except BaseException as e: errors.append(e)
+
+        # Daemon threads (not an executor, whose workers are joined at exit): an interrupted run exits at once
+        start_time = time.perf_counter()
+        threads = [threading.Thread(target=run_part, args=(i,), daemon=True) for i in range(parts)]
+        for t in threads: t.start()
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.5)
+            if quiet or not size: continue
+            done = sum(state["done"])
+            rate = done / max(time.perf_counter() - start_time, 1e-6)
+            sys.stdout.write(f"\r  {done / size * 100:5.1f}% of {size / 1024**3:.2f}GB at {rate / 1024**2:.1f}MB/s")
+            sys.stdout.flush()
+        if errors: raise errors[0]
+        if not quiet and size: print()
+
+        digest = file_sha256(partial)
+        expected = model_info.get("sha256")
+        if expected and digest != expected:
+            partial.unlink()
+            state_path.unlink(missing_ok=True)
+            raise Exception(f"SHA-256 mismatch for {name}: expected {expected}, got {digest}")
+        if not expected:
+            print(f"  {name} is not pinned; add \"sha256\": \"{digest}\" to models.json (or run runner.py --pin-digests) to verify future downloads")
+        blob = self.store(partial, digest, url)
+        state_path.unlink(missing_ok=True)
+        print(f"  Downloaded {name} in {time.perf_counter() - start_time:.1f}s")
+        return blob
+
+def link_target(blob: Path, target: Path) -> Path:
+    if blob != target: link_or_copy(blob, target)
+    return target
@@ -0,0 +1,147 @@
+import json
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Callable
+from dataset_reader import iter_dataset
+from scoring import FIELDS
+import output_formats
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Turn 'const:MS', 'uniform:LO:HI', 'normal:MEAN:SD' or 'lognormal:MEDIAN:SIGMA' into a sampler (seconds)."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "const":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal":
+        # Parameterised by median (ms) so specs read like the latencies they produce
+        return lambda rng: values[0] * rng.lognormvariate(0, values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+def canned_outputs(dataset_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Map each 'Parse: <filename>' prompt to the dataset's expected answer in the runner's output schema."""
+    outputs = {}
+    for path in dataset_paths:
+        for item in iter_dataset(path):
+            expected = item.get("expected") or item
+            filename = os.path.basename(item.get("relativePath", ""))
+            outputs[f"Parse: {filename}"] = {f: expected.get(f, expected.get(f.lower())) for f in FIELDS}
+    return outputs
+
+class FakeLlamaServer:
+    """Deterministic stand-in for llama-server's /health and /v1/chat/completions, for harness benchmarking."""
+
+    def __init__(self, port: int, outputs: Dict[str, Dict[str, Any]], latency: str = "const:0", slots: int = 1):
+        self.port = port
+        self.url = f"http://localhost:{port}"
+        self.outputs = outputs
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.slots = slots
+        self.rng = random.Random(42)
+        self.rng_lock = threading.Lock()
+        self.httpd = None
+
+    def next_latency(self) -> float:
+        with self.rng_lock:
+            return self.sample_latency(self.rng)
+
+    def completion(self, body: Dict[str, Any]) -> tuple:
+        prompt = body["messages"][-1]["content"]
+        blank = {f: None for f in FIELDS}
+        batched = prompt.startswith("Parse:\n")
+        if batched:
+            # Batched request: numbered filenames, one answer per line
+            names = [line.split(". ", 1)[-1] for line in prompt.splitlines()[1:]]
+            output = [self.outputs.get(f"Parse: {name}") or blank for name in names]
+        else:
+            names = [prompt]
+            output = [self.outputs.get(prompt) or blank]
+        # Answer in whatever encoding the request's schema or grammar asks for
+        content = output_formats.render(output_formats.detect(body), output, batched)
+        prompt_chars = sum(len(m["content"]) for m in body["messages"])
+        return content, prompt_chars // 4, max(1, len(content) // 4), len(names)
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; Nagle + delayed ACK would add ~40ms to each reply
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args): pass
+
+            def send_json(self, payload: Dict[str, Any], status: int = 200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self.send_json({"status": "ok"})
+                elif self.path == "/props":
+                    self.send_json({"total_slots": server.slots})
+                elif self.path == "/v1/models":
+                    self.send_json({"data": [{"id": f"fake:{server.latency_spec}"}]})
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                if self.path != "/v1/chat/completions":
+                    self.send_json({"error": "not found"}, 404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                content, prompt_n, predicted_n, items = server.completion(body)
+                latency = server.next_latency()
+                # Charge 30% of the sampled latency to prefill and the rest to decode, which grows with the answers generated
+                prefill, decode = latency * 0.3, latency * 0.7 * items
+                latency = prefill + decode
+                timings = {"prompt_n": prompt_n, "cache_n": 0, "prompt_ms": prefill * 1000,
+                           "predicted_n": predicted_n, "predicted_ms": decode * 1000}
+
+                if not body.get("stream"):
+                    time.sleep(latency)
+                    self.send_json({"choices": [{"message": {"role": "assistant", "content": content}}], "timings": timings})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(prefill)
+                pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+                for piece in pieces:
+                    event = {"choices": [{"delta": {"content": piece}}]}
+                    self.send_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    time.sleep(decode / len(pieces))
+                final = {"choices": [{"delta": {}, "finish_reason": "stop"}], "timings": timings}
+                self.send_chunk(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.send_chunk(b"")
+
+        return Handler
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(("localhost", self.port), self.handler())
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
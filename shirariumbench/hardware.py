@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import platform
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, List
+
+# Instruction sets llama.cpp picks kernels for (x86 /proc/cpuinfo "flags", ARM "Features")
+ISA_FLAGS = ["sse3", "ssse3", "avx", "avx2", "fma", "f16c", "avx_vnni", "avx512f", "avx512bw", "avx512vl",
+             "avx512_vnni", "avx512_bf16", "amx_tile", "amx_int8", "asimd", "asimddp", "asimdhp", "i8mm", "sve", "sve2"]
+# macOS reports the same features as hw.optional.* sysctls
+MAC_ISA = {"hw.optional.avx1_0": "avx", "hw.optional.avx2_0": "avx2", "hw.optional.fma": "fma",
+           "hw.optional.avx512f": "avx512f", "hw.optional.arm.FEAT_DotProd": "asimddp",
+           "hw.optional.arm.FEAT_I8MM": "i8mm", "hw.optional.arm.FEAT_FP16": "asimdhp"}
+
+def sysctl(name: str) -> str:
+    try:
+        return subprocess.check_output(["sysctl", "-n", name], text=True, stderr=subprocess.DEVNULL).strip()
+    except: return ""
+
+def cpu_topology() -> Dict[str, Any]:
+    """CPU model, physical/logical core counts and the SIMD extensions available to llama.cpp."""
+    info = {"cpu": platform.processor() or "Unknown CPU", "cores": None, "threads": os.cpu_count(),
+            "usable": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(), "isa": []}
+    if sys.platform.startswith("linux"):
+        try:
+            cores, flags, core = set(), set(), {}
+            for line in Path("/proc/cpuinfo").read_text().splitlines():
+                key, _, value = (part.strip() for part in line.partition(":"))
+                if key == "model name" and info["cpu"] in ("", "Unknown CPU", platform.machine()):
+                    info["cpu"] = value
+                elif key in ("physical id", "core id"):
+                    core[key] = value
+                    if len(core) == 2: cores.add((core["physical id"], core["core id"]))
+                elif key in ("flags", "Features"):
+                    flags.update(value.split())
+                elif not line.strip():
+                    core = {}
+            if "pni" in flags: flags.add("sse3")  # the kernel's name for SSE3
+            # Containers and ARM often hide the topology; fall back to the logical count
+            info["cores"] = len(cores) or info["threads"]
+            info["isa"] = [f for f in ISA_FLAGS if f in flags]
+        except OSError: pass
+    elif sys.platform == "darwin":
+        info["cpu"] = sysctl("machdep.cpu.brand_string") or info["cpu"]
+        info["cores"] = int(sysctl("hw.physicalcpu") or 0) or None
+        info["isa"] = [flag for name, flag in MAC_ISA.items() if sysctl(name) == "1"]
+    return info
+
+def total_memory() -> int:
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    except OSError: pass
+    size = sysctl("hw.memsize") if sys.platform == "darwin" else ""
+    return int(size) if size.isdigit() else None
+
+def available_memory() -> int:
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    except OSError: pass
+    return None
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """Current and peak resident set size (bytes) of a process, from /proc; empty where unavailable."""
+    memory = {}
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"): memory["rss"] = int(line.split()[1]) * 1024
+            elif line.startswith("VmHWM:"): memory["rss_peak"] = int(line.split()[1]) * 1024
+    except OSError: pass
+    return memory
+
+def process_tree(pid: int) -> List[int]:
+    """The process and all of its descendants, from the parent pids in /proc/<pid>/stat."""
+    children = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit(): continue
+        try: ppid = int((entry / "stat").read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError): continue
+        children.setdefault(ppid, []).append(int(entry.name))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+def process_counters(pid: int) -> Dict[str, int]:
+    """Cumulative CPU ticks, page faults and context switches plus current/peak RSS of one process."""
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    counters = {"minflt": int(fields[7]), "majflt": int(fields[9]), "cpu": int(fields[11]) + int(fields[12]), "ctx_vol": 0, "ctx_invol": 0}
+    # Context switches are per thread; llama-server runs one worker thread per core
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        try:
+            for line in (task / "status").read_text().splitlines():
+                if line.startswith("voluntary_ctxt_switches:"): counters["ctx_vol"] += int(line.split()[1])
+                elif line.startswith("nonvoluntary_ctxt_switches:"): counters["ctx_invol"] += int(line.split()[1])
+        except OSError: pass  # thread exited between listing and reading
+    counters.update(process_memory(pid))
+    return counters
+
+def core_times() -> Dict[int, tuple]:
+    """(busy, total) jiffies per logical CPU id from /proc/stat (offline CPUs are absent)."""
+    cores = {}
+    for line in Path("/proc/stat").read_text().splitlines():
+        if line.startswith("cpu") and line[3:4].isdigit():
+            name, *fields = line.split()
+            values = [int(v) for v in fields]
+            idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+            cores[int(name[3:])] = (sum(values) - idle, sum(values))
+    return cores
+
+COUNTERS = ("cpu", "minflt", "majflt", "ctx_vol", "ctx_invol")
+
+class ResourceSampler:
+    """Samples a process tree from /proc every `interval` seconds on a background thread.
+
+    Counters are accumulated per pid as deltas, so a helper process exiting mid-run never makes a total go backwards.
+    Per-core utilisation is system-wide, so a server pinned to `cores` only reports those (others may run other servers).
+    """
+
+    def __init__(self, pid: int, interval: float = 1.0, cores: List[int] = None):
+        self.pid = pid
+        self.interval = interval
+        self.cores = cores
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.last = {}
+        self.rss_peak, self.rss_sum, self.samples = 0, 0, 0
+        self.timeline = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def sample(self):
+        rss = 0
+        for pid in process_tree(self.pid):
+            try: counters = process_counters(pid)
+            except (OSError, IndexError, ValueError): continue
+            previous = self.last.get(pid)
+            if previous:
+                for k in COUNTERS: self.totals[k] += max(0, counters.get(k, 0) - previous.get(k, 0))
+            self.last[pid] = counters
+            rss += counters.get("rss", 0)
+            self.rss_peak = max(self.rss_peak, counters.get("rss_peak", 0))
+        self.rss_peak = max(self.rss_peak, rss)
+        self.rss_sum += rss
+        self.samples += 1
+        self.timeline.append([round(time.perf_counter() - self.started, 2), rss, round(self.totals["cpu"] / self.tick, 2)])
+
+    def run(self):
+        # Ends on its own once the server is gone, even if stop() is never reached
+        while not self.stop_event.wait(self.interval) and Path(f"/proc/{self.pid}").exists():
+            self.sample()
+
+    def start(self) -> "ResourceSampler":
+        if not Path(f"/proc/{self.pid}/stat").exists(): return self  # no /proc (macOS, Windows): record nothing
+        self.started = time.perf_counter()
+        self.cores_start = core_times()
+        self.sample()  # baseline
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and return the run's totals (empty when nothing could be sampled)."""
+        if not self.thread: return {}
+        self.stop_event.set()
+        self.thread.join()
+        self.sample()
+        end = core_times()
+        ids = [c for c in (self.cores or sorted(end)) if c in end and c in self.cores_start]
+        cores = [(end[c][0] - self.cores_start[c][0]) / (end[c][1] - self.cores_start[c][1])
+                 if end[c][1] > self.cores_start[c][1] else 0.0 for c in ids]
+        return {
+            "rss_peak": self.rss_peak, "rss_mean": self.rss_sum // self.samples,
+            "cpu_s": self.totals["cpu"] / self.tick, **{k: self.totals[k] for k in COUNTERS[1:]},
+            "core_util": [round(c, 3) for c in cores], "cores": self.cores, "interval": self.interval,
+            "elapsed_s": time.perf_counter() - self.started,
+            # [seconds since start, tree RSS bytes, cumulative CPU seconds] per sample
+            "timeline": self.timeline
+        }
+
+def merge_resources(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine shard samples: counters add up, memory is the worst shard, per-core use is kept only when unambiguous."""
+    parts = [p for p in parts if p]
+    if not parts: return {}
+    return {"rss_peak": max(p["rss_peak"] for p in parts), "rss_mean": max(p["rss_mean"] for p in parts),
+            "cpu_s": sum(p["cpu_s"] for p in parts), **{k: sum(p[k] for p in parts) for k in COUNTERS[1:]},
+            "core_util": parts[0]["core_util"] if len(parts) == 1 else [], "interval": parts[0]["interval"],
+            "elapsed_s": max(p["elapsed_s"] for p in parts), "timeline": parts[0]["timeline"] if len(parts) == 1 else []}
+
+def get_hardware_info() -> Dict[str, Any]:
+    topology = cpu_topology()
+    ram = total_memory()
+    info = {
+        "os": f"{platform.system()} {platform.release()}",
+        "cpu": topology["cpu"],
+        "cores": topology["cores"],
+        "threads": topology["threads"],
+        "usable_threads": topology["usable"],
+        "isa": topology["isa"],
+        "gpu": "Unknown GPU",
+        "ram": f"{ram / 1024**3:.0f}GB" if ram else "Unknown"
+    }
+    try:
+        # Try to get GPU name via nvidia-smi
+        cmd = ["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"]
+        gpu = subprocess.check_output(cmd, text=True, stderr=subprocess.DEVNULL).strip()
+        if gpu: info["gpu"] = gpu
+    except: pass
+    return info
@@ -0,0 +1,187 @@
+import os
+import re
+import unicodedata
+from typing import Dict, Any, List
+
+# Mirrors src/Jellyfin.Plugin.Shirarium/Services/HeuristicParser.cs; keep the two in sync
+
+COMMON_JUNK = {
+    "1080p", "720p", "2160p", "4k", "2k", "bluray", "brrip", "webrip", "webdl", "web", "x264", "x265",
+    "h264", "h265", "aac", "dts", "hevc", "remux", "proper", "repack", "dual", "audio", "multi",
+    "hdtv", "xvid", "divx", "ac3", "dts-hd", "truehd", "atmos", "unrated", "extended", "cut",
+    "directors", "internal", "limited", "nf", "amzn", "dnp", "dsnp", "hmax", "hulu", "fr", "en", "jpn",
+    "v2", "v3", "v4", "uhd", "hdr", "dovi", "dv", "10bit", "8bit", "complete", "season", "pack"
+}
+IGNORED_FOLDERS = {"movies", "tv", "media", "organized", "incoming"}
+
+SEASON_EPISODE_RE = re.compile(r"(?:^|[\W_])(?:[sS](\d{1,2})[\W_]?[eE](\d{1,4})|(\d{1,2})x(\d{1,4})|[sS](\d{1,2}))(?:[\W_]?[eE](\d{1,4}))?(?:$|[\W_])")
+YEAR_PAREN_RE = re.compile(r"[\(\[]((?:19|20)\d{2})[\)\]]")
+YEAR_RE = re.compile(r"(?:^|[\W_])((?:19|20)\d{2})(?:$|[\W_])")
+ABSOLUTE_EPISODE_RE = re.compile(r"(?:^|[\W_])(?:- )?(?!19\d{2}|20\d{2})(\d{1,4})(?:$|[\W_])")
+QUAL_RE = re.compile(r"(?:^|[\W_])(1080p|720p|2160p|4k|bluray|web-?dl|brrip|webrip|hdtv|divx|xvid|dvdr|dvdrip)(?:$|[\W_])", re.IGNORECASE)
+VIDEO_CODEC_RE = re.compile(r"(?:^|[\W_])(x264|x265|h264|h265|hevc|av1|divx|xvid|mpeg2|vp9)(?:$|[\W_])", re.IGNORECASE)
+AUDIO_CODEC_RE = re.compile(r"(?:^|[\W_])(aac|ac3|dts(?:-hd)?|truehd|atmos|mp3|flac|eac3|vorbis|opus)(?:$|[\W_])", re.IGNORECASE)
+AUDIO_CHANNELS_RE = re.compile(r"(?:^|[\W_])(2\.0|5\.1|7\.1)(?:$|[\W_])")
+RELEASE_GROUP_RE = re.compile(r"-([a-zA-Z0-9]+)(?:$|\.[a-zA-Z0-9]{2,4}$)")
+CRC_RE = re.compile(r"\[[0-9a-fA-F]{8}\]")
+LEADING_TAG_RE = re.compile(r"^[\[\({]([^}\)\]]+)[\]\)}]\s*")
+SPLIT_RE = re.compile(r"[.\-_()\[\]\s]+")
+STANDALONE_SEASON_RE = re.compile(r"[sS]\d+")
+VERSION_RE = re.compile(r"^v\d+$")
+
+def parse(path: str) -> Dict[str, Any]:
+    """Parse a relative media path the way the plugin does before deciding whether to ask the LLM."""
+    parts = re.split(r"[\\/]", path)
+    result = parse_core(os.path.splitext(parts[-1])[0])
+
+    # Folder context: fill gaps from up to two parent directories
+    for parent in reversed(parts[-3:-1]):
+        if not parent.strip() or parent.lower() in IGNORED_FOLDERS: continue
+        parent_result = parse_core(parent)
+        if result["Title"] == "Unknown Title" or len(result["Title"]) < 3 or result["Title"].strip().lstrip("+-").isdigit():
+            if parent_result["Title"] != "Unknown Title":
+                result["Title"] = parent_result["Title"]
+        for field in ("Year", "Season", "Episode"):
+            if result[field] is None: result[field] = parent_result[field]
+        if result["MediaType"] == "unknown":
+            result["MediaType"] = parent_result["MediaType"]
+        if result["Title"] != "Unknown Title" and result["MediaType"] != "unknown": break
+    return result
+
+def followed_by_junk(text: str) -> bool:
+    text = text.lower()
+    return any(j in text for j in COMMON_JUNK)
+
+def parse_core(stem: str) -> Dict[str, Any]:
+    stem = CRC_RE.sub("", stem)
+    while True:
+        match = LEADING_TAG_RE.match(stem)
+        if not match: break
+        stem = stem[match.end():]
+
+    season = episode = year = None
+    media_type, confidence, title_stem = "unknown", 0.4, stem
+
+    def first_group(regex: re.Pattern, lower: bool = True) -> str:
+        match = regex.search(stem)
+        if not match: return None
+        return match.group(1).lower() if lower else match.group(1)
+
+    resolution = first_group(QUAL_RE)
+    video_codec = first_group(VIDEO_CODEC_RE)
+    audio_codec = first_group(AUDIO_CODEC_RE)
+    audio_channels = first_group(AUDIO_CHANNELS_RE, lower=False)
+    release_group = first_group(RELEASE_GROUP_RE, lower=False)
+
+    se = SEASON_EPISODE_RE.search(stem)
+    if se:
+        media_type, confidence = "episode", confidence + 0.35
+        if se.group(1) and se.group(2):
+            season, episode = int(se.group(1)), int(se.group(2))
+        elif se.group(3) and se.group(4):
+            season, episode = int(se.group(3)), int(se.group(4))
+        elif se.group(5):
+            season = int(se.group(5))
+        else:
+            season, episode = 1, 1
+        title_stem = stem[:se.start()]
+    else:
+        absolute = ABSOLUTE_EPISODE_RE.search(stem)
+        if absolute:
+            num = int(absolute.group(1))
+            year_like = 1900 <= num <= 2100
+            lowered = stem.lower()
+            has_keywords = any(k in lowered for k in ("season", "ep", "subs", "raws"))
+            if " - " in stem or (not year_like and (has_keywords or followed_by_junk(stem[absolute.end():]))):
+                media_type, confidence = "episode", confidence + 0.25
+                season, episode = 1, num
+                title_stem = stem[:absolute.start()]
+
+    paren = YEAR_PAREN_RE.search(stem)
+    if paren:
+        year = int(paren.group(1))
+        if media_type == "unknown": media_type = "movie"
+        idx = stem.find(paren.group(0))
+        if idx > 2: title_stem = stem[:idx]
+    else:
+        match = YEAR_RE.search(stem)
+        if match:
+            found = int(match.group(1))
+            junk_after = followed_by_junk(stem[match.end():])
+            if match.start() < 2:
+                # A leading year is only a year when junk follows it; otherwise it's a title like "1917"
+                if junk_after:
+                    year, title_stem = found, stem[:match.start()]
+                else:
+                    second = YEAR_RE.search(stem, match.end())
+                    if second:
+                        year, title_stem = int(second.group(1)), stem[:second.start()]
+                if year is not None and media_type == "unknown": media_type = "movie"
+            else:
+                year = found
+                if media_type == "unknown": media_type = "movie"
+                if junk_after or stem.rstrip().endswith(str(found)):
+                    title_stem = stem[:match.start()]
+
+    # Final fallback for anime seasons (S4)
+    if media_type == "unknown" and (STANDALONE_SEASON_RE.search(stem) or "season" in stem.lower()):
+        media_type = "episode"
+
+    tokens = [t for t in SPLIT_RE.split(title_stem) if t.strip()]
+    title = normalize_title_tokens(tokens)
+    if " - " in title:
+        parts = title.split(" - ")
+        if parts[-1].lower() in COMMON_JUNK or QUAL_RE.search(parts[-1]):
+            title = " - ".join(parts[:-1]).strip()
+
+    if media_type == "movie" and year is not None:
+        confidence += 0.2
+
+    return {
+        "Title": title, "MediaType": media_type, "Year": year, "Season": season, "Episode": episode,
+        "Confidence": min(round(confidence, 3), 1.0), "RawTokens": tokens, "Resolution": resolution,
+        "VideoCodec": video_codec, "AudioCodec": audio_codec, "AudioChannels": audio_channels,
+        "ReleaseGroup": release_group
+    }
+
+def is_acronym(token: str) -> bool:
+    if not token.strip(): return False
+    if len(token) >= 2 and all(c.isupper() or c.isdigit() for c in token): return True
+    return "." in token and all(len(part) == 1 for part in token.split(".") if part)
+
+def title_case(token: str) -> str:
+    # str.title() capitalises after apostrophes ("Don'T"); .NET's TextInfo.ToTitleCase does not
+    return re.sub(r"'(\w)", lambda m: "'" + m.group(1).lower(), token.lower().title())
+
+def normalize_title_tokens(tokens: List[str]) -> str:
+    cleaned = []
+    for token in tokens:
+        low = token.lower()
+        if low in COMMON_JUNK or VERSION_RE.match(low) or low in ("x264", "x265", "h264", "h265"): break
+        cleaned.append(token)
+    if not cleaned: return "Unknown Title"
+
+    # Merge runs of single letters (S H I E L D -> S.H.I.E.L.D.)
+    merged, i = [], 0
+    while i < len(cleaned):
+        if len(cleaned[i]) == 1 and i + 1 < len(cleaned) and len(cleaned[i + 1]) == 1:
+            acronym = ""
+            while i < len(cleaned) and len(cleaned[i]) == 1:
+                acronym += cleaned[i].upper() + "."
+                i += 1
+            merged.append(acronym)
+        else:
+            merged.append(cleaned[i])
+            i += 1
+
+    title = " ".join(t if is_acronym(t) else title_case(t) for t in merged).strip()
+    return strip_accents(title)
+
+def strip_accents(s: str) -> str:
+    out = []
+    for c in s:
+        if ord(c) < 0x0300:
+            out.extend(ch for ch in unicodedata.normalize("NFD", c) if unicodedata.category(ch) != "Mn")
+        else:
+            out.append(c)
+    return unicodedata.normalize("NFC", "".join(out))
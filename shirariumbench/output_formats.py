@@ -0,0 +1,155 @@
+import json
+from typing import Dict, Any, List
+from scoring import FIELDS
+
+SYSTEM_PROMPT = (
+    "You are a deterministic data extraction engine. Parse the provided media filename into a strict JSON object.\n"
+    "Rules:\n"
+    "- release_year: choose the release year (often in parentheses or near resolution).\n"
+    "- title: the name of the media, including title years if applicable.\n"
+    "- Use null for missing values. No conversational text."
+)
+
+# System prompt + few-shot turns shared by every request; only the final user turn changes
+PROMPT_PREFIX = [
+    {"role": "system", "content": SYSTEM_PROMPT},
+    {"role": "user", "content": "1984 (1984) 1080p BluRay.mkv"},
+    {"role": "assistant", "content": '{"Title": "1984", "Year": 1984, "Resolution": "1080p", "Season": null, "Episode": null}'},
+    {"role": "user", "content": "2012.2009.1080p.mkv"},
+    {"role": "assistant", "content": '{"Title": "2012", "Year": 2009, "Resolution": "1080p", "Season": null, "Episode": null}'}
+]
+
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "Title": {"type": "string"}, "Year": {"type": ["number", "null"]},
+        "Season": {"type": ["number", "null"]}, "Episode": {"type": ["number", "null"]},
+        "Resolution": {"type": ["string", "null"]}
+    },
+    "required": ["Title", "Year", "Season", "Episode", "Resolution"]
+}
+
+# Batch mode: several numbered filenames per request, answered as a JSON array in the same order
+BATCH_PREFIX = [
+    {"role": "system", "content": SYSTEM_PROMPT.replace("filename into a strict JSON object", "filenames into a strict JSON array with one object per filename, in input order")},
+    {"role": "user", "content": "Parse:\n1. 1984 (1984) 1080p BluRay.mkv\n2. 2012.2009.1080p.mkv"},
+    {"role": "assistant", "content": '[{"Title": "1984", "Year": 1984, "Resolution": "1080p", "Season": null, "Episode": null}, '
+                                     '{"Title": "2012", "Year": 2009, "Resolution": "1080p", "Season": null, "Episode": null}]'}
+]
+
+# Compact encodings: fewer generated tokens per item, decoded back to the FIELDS dict before scoring
+EXAMPLES = [
+    ("1984 (1984) 1080p BluRay.mkv", {"Title": "1984", "Year": 1984, "Season": None, "Episode": None, "Resolution": "1080p"}),
+    ("2012.2009.1080p.mkv", {"Title": "2012", "Year": 2009, "Season": None, "Episode": None, "Resolution": "1080p"})
+]
+SHORT_KEYS = {"Title": "t", "Year": "y", "Season": "s", "Episode": "e", "Resolution": "r"}
+# How the system prompt describes each encoding: (single filename, batch)
+FORMATS = {
+    "short": ("a strict JSON object with short keys t (title), y (release_year), s (season), e (episode), r (resolution)",
+              "a strict JSON array with one object per filename, in input order, using short keys t (title), y (release_year), s (season), e (episode), r (resolution)"),
+    "array": ("a strict JSON array [title, release_year, season, episode, resolution]",
+              "a strict JSON array with one [title, release_year, season, episode, resolution] array per filename, in input order"),
+    "gbnf": ("a single line title|release_year|season|episode|resolution",
+             "one line title|release_year|season|episode|resolution per filename, in input order")
+}
+ENCODINGS = ["json", *FORMATS]
+
+NULLABLE_NUMBER = {"type": ["number", "null"]}
+NULLABLE_STRING = {"type": ["string", "null"]}
+SHORT_SCHEMA = {
+    "type": "object",
+    "properties": {"t": {"type": "string"}, "y": NULLABLE_NUMBER, "s": NULLABLE_NUMBER, "e": NULLABLE_NUMBER, "r": NULLABLE_STRING},
+    "required": ["t", "y", "s", "e", "r"]
+}
+ARRAY_SCHEMA = {
+    "type": "array",
+    "prefixItems": [{"type": "string"}, NULLABLE_NUMBER, NULLABLE_NUMBER, NULLABLE_NUMBER, NULLABLE_STRING],
+    "items": False, "minItems": 5, "maxItems": 5
+}
+ITEM_SCHEMAS = {"json": OUTPUT_SCHEMA, "short": SHORT_SCHEMA, "array": ARRAY_SCHEMA}
+
+# Pipe-delimited line per item: no keys, quotes or nulls to generate
+LINE_GRAMMAR = (
+    'line ::= title "|" num "|" num "|" num "|" res\n'
+    'title ::= [^|\\n]+\n'
+    'num ::= [0-9]{0,4}\n'
+    'res ::= [^|\\n]{0,12}\n'
+)
+
+def grammar(size: int, batched: bool) -> str:
+    root = 'root ::= line ("\\n" line){%d}\n' % (size - 1) if batched and size > 1 else "root ::= line\n"
+    return root + LINE_GRAMMAR
+
+def batch_schema(size: int, encoding: str = "json") -> Dict[str, Any]:
+    return {"type": "array", "items": ITEM_SCHEMAS[encoding], "minItems": size, "maxItems": size}
+
+def constraint(encoding: str, size: int, batched: bool) -> Dict[str, Any]:
+    """Request fields that force the answer into the encoding: a GBNF grammar or a JSON schema."""
+    if encoding == "gbnf":
+        return {"grammar": grammar(size, batched)}
+    schema = batch_schema(size, encoding) if batched else ITEM_SCHEMAS[encoding]
+    return {"response_format": {"type": "json_object", "schema": schema}}
+
+def render(encoding: str, answers: List[Dict[str, Any]], batched: bool) -> str:
+    """Encode answers the way the model is asked to produce them (few-shot turns, fake server)."""
+    if encoding == "gbnf":
+        return "\n".join("|".join("" if a.get(f) is None else str(a[f]) for f in FIELDS) for a in answers)
+    if encoding == "short":
+        items = [{SHORT_KEYS[f]: a.get(f) for f in FIELDS} for a in answers]
+    elif encoding == "array":
+        items = [[a.get(f) for f in FIELDS] for a in answers]
+    else:
+        items = [{f: a.get(f) for f in FIELDS} for a in answers]
+    return json.dumps(items if batched else items[0], ensure_ascii=False)
+
+def prefix(encoding: str, batched: bool) -> List[Dict[str, str]]:
+    if encoding == "json":
+        return BATCH_PREFIX if batched else PROMPT_PREFIX
+    described = FORMATS[encoding][1] if batched else FORMATS[encoding][0]
+    system = SYSTEM_PROMPT.replace("filename into a strict JSON object", ("filenames into " if batched else "filename into ") + described)
+    if encoding == "gbnf":
+        system = system.replace("Use null for missing values", "Leave missing values empty")
+    if not batched:
+        turns = []
+        for filename, answer in EXAMPLES:
+            turns += [{"role": "user", "content": filename}, {"role": "assistant", "content": render(encoding, [answer], False)}]
+        return [{"role": "system", "content": system}] + turns
+    prompt = "Parse:\n" + "\n".join(f"{i}. {filename}" for i, (filename, _) in enumerate(EXAMPLES, 1))
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt},
+            {"role": "assistant", "content": render(encoding, [a for _, a in EXAMPLES], True)}]
+
+def number(value: str) -> Any:
+    value = value.strip()
+    return int(value) if value.isdigit() else (value or None)
+
+def decode(encoding: str, text: str, size: int, batched: bool) -> List[Dict[str, Any]]:
+    """Turn the model's reply back into `size` FIELDS dicts; unusable or missing items become error dicts."""
+    if encoding == "gbnf":
+        lines = [line for line in text.strip().split("\n") if line.strip()][:size if batched else 1]
+        items = []
+        for line in lines:
+            parts = (line.split("|") + [""] * 5)[:5]
+            items.append({"Title": parts[0].strip() or None, "Year": number(parts[1]), "Season": number(parts[2]),
+                          "Episode": number(parts[3]), "Resolution": parts[4].strip() or None})
+    else:
+        try: parsed = json.loads(text)
+        except: parsed = None
+        if batched:
+            items = parsed[:size] if isinstance(parsed, list) else []
+        else:
+            items = [parsed]
+        if encoding == "short":
+            items = [{f: item.get(SHORT_KEYS[f]) for f in FIELDS} if isinstance(item, dict) else None for item in items]
+        elif encoding == "array":
+            items = [dict(zip(FIELDS, item)) if isinstance(item, list) else None for item in items]
+        items = [item if isinstance(item, dict) else {"error": "Invalid JSON"} for item in items]
+    return items + [{"error": "Missing from batch"}] * (size - len(items))
+
+def detect(body: Dict[str, Any]) -> str:
+    """Which encoding a chat completion request asks for (used by the fake server)."""
+    if body.get("grammar"): return "gbnf"
+    schema = (body.get("response_format") or {}).get("schema") or OUTPUT_SCHEMA
+    if schema.get("type") == "array" and "items" in schema and schema["items"] is not False:
+        schema = schema["items"]
+    if schema.get("type") == "array": return "array"
+    return "short" if "t" in schema.get("properties", {}) else "json"
@@ -1,16 +1,33 @@
 import json
 import time
+import hashlib
+import sqlite3
 import argparse
 import requests
 import os
 import subprocess
 import signal
+import re
 import zipfile
+import random
+import csv
 import sys
 import threading
-import platform
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice, product
+from queue import Queue, Empty
 from pathlib import Path
 from typing import Dict, Any, List
+from dataset_reader import select_window, parse_shard
+from fake_server import FakeLlamaServer, canned_outputs
+from scoring import FIELDS, ScoreTable, Vocabulary, breakdown, score_pair
+from hardware import get_hardware_info, available_memory, ResourceSampler, merge_resources
+from output_formats import PROMPT_PREFIX, BATCH_PREFIX, OUTPUT_SCHEMA, ENCODINGS
+from downloader import ModelDownloader
+from server_log import ServerLog, rates, merge_metrics
+from stats import percentile, bootstrap, mean, mean_ci
+import output_formats
+import heuristic_parser
 
 def load_dotenv():
     env_path = Path(".env")
@@ -20,20 +37,157 @@ def load_dotenv():
                 key, value = line.split("=", 1)
                 os.environ[key.strip()] = value.strip()
 
-def get_hardware_info() -> Dict[str, str]:
-    info = {
-        "os": f"{platform.system()} {platform.release()}",
-        "cpu": platform.processor() or "Unknown CPU",
-        "gpu": "Unknown GPU",
-        "ram": f"{round(sys.maxsize / (1024**3) * 8)}GB" # Rough estimate
-    }
-    try:
-        # Try to get GPU name via nvidia-smi
-        cmd = ["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"]
-        gpu = subprocess.check_output(cmd, text=True, stderr=subprocess.DEVNULL).strip()
-        if gpu: info["gpu"] = gpu
-    except: pass
-    return info
+SLOT_CTX = 2048  # tokens of context per llama-server slot
+
+# llama-server tuning knobs; 0 leaves the setting to llama.cpp's own default
+# draft: max tokens the draft model proposes per step (speculative decoding); 0 runs without a draft model
+DEFAULT_SERVER_CONFIG = {"threads": 0, "batch": 0, "ubatch": 0, "ctx": SLOT_CTX, "kv": "f16", "flash_attn": "on", "draft": 0}
+
+def model_variants(model: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """A manifest entry plus one entry per declared quant variant: same family, own id (`<id>@<quant>`), file and digest.
+    A variant's url/filename default to the base ones with the quant suffix swapped, matching the base's case."""
+    base = {**{k: v for k, v in model.items() if k != "variants"}, "family": model["id"]}
+    entries = [base]
+    for variant in model.get("variants", []):
+        quant = variant["quant"]
+        def swap(text: str) -> str:
+            swapped, count = re.subn(re.escape(model["quant"]) + r"(?=\.gguf$)",
+                                     lambda m: quant.lower() if m.group(0).islower() else quant, text, flags=re.IGNORECASE)
+            if not count: raise ValueError(f"{model['id']}: can't derive the {quant} file from {text}; give url/filename in the variant")
+            return swapped
+        entry = {k: v for k, v in base.items() if k != "sha256"}  # digests belong to one file
+        entry.update(url=variant.get("url") or swap(model["url"]), filename=variant.get("filename") or swap(model["filename"]))
+        entry.update({k: v for k, v in variant.items() if k not in ("url", "filename")})
+        entry.update(id=f"{model['id']}@{quant.lower()}", name=f"{model['name']} {quant}")
+        entries.append(entry)
+    return entries
+
+def pin_digests(manifest: Dict[str, Any], downloader: ModelDownloader, path: str = "shirariumbench/models.json") -> bool:
+    """Fill in missing sha256 fields from the model cache or the Hub's LFS metadata; False if any stayed unpinned."""
+    missing = 0
+    for model in manifest["models"]:
+        files = [(model, model)] + [(v, e) for v, e in zip(model.get("variants", []), model_variants(model)[1:])]
+        if model.get("draft"): files.append((model["draft"], model["draft"]))
+        for entry, info in files:
+            if entry.get("sha256"): continue
+            cached = downloader.cached(info)
+            try: digest = cached.name if cached else downloader.remote_digest(info["url"])
+            except requests.RequestException as e: digest, error = None, e
+            else: error = "no LFS digest in the response"
+            if digest:
+                entry["sha256"] = digest
+                print(f"  {info['name']}: {digest}")
+            else:
+                missing += 1
+                print(f"!! {info['name']}: {error}")
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    return not missing
+
+def estimate_tokens(filename: str) -> int:
+    # ~3 chars per token for dotted release names, plus the numbering and the item's JSON answer
+    return len(filename) // 3 + 4 + 40
+
+def pack_batches(entries: List[tuple], size: int) -> List[List[tuple]]:
+    """Group (filename, payload) entries into requests of up to `size`, first-fit by token length so
+    each request fills a slot's context without overflowing it."""
+    budget = SLOT_CTX - sum(len(m["content"]) for m in BATCH_PREFIX) // 3 - 64
+    bins = []  # [tokens used, entries]
+    for entry in sorted(entries, key=lambda e: -estimate_tokens(e[0])):
+        cost = estimate_tokens(entry[0])
+        for b in bins:
+            if len(b[1]) < size and b[0] + cost <= budget:
+                b[0] += cost
+                b[1].append(entry)
+                break
+        else:
+            bins.append([cost, [entry]])
+    return [b[1] for b in bins]
+
+def partition_cores(instances: int) -> List[List[int]]:
+    # Split the CPUs this process may use into disjoint, equally sized sets (one per server instance)
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    size = max(1, len(cores) // instances)
+    return [cores[i * size:(i + 1) * size] or cores for i in range(instances)]
+
+class MemoryGate:
+    """Admission control for concurrent servers: a model starts only if its estimated footprint fits the RAM budget."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.reserved = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, need: int):
+        with self.cond:
+            # Always admit when nothing is running, otherwise an oversized model would wait forever
+            while self.budget and self.reserved and self.reserved + need > self.budget:
+                self.cond.wait()
+            self.reserved += need
+
+    def release(self, need: int):
+        with self.cond:
+            self.reserved -= need
+            self.cond.notify_all()
+
+class ResultStore:
+    """SQLite store of raw model outputs, keyed by model hash, prompt hash, server flags and filename."""
+
+    def __init__(self, path: Path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "model_hash TEXT, prompt_hash TEXT, server_flags TEXT, filename TEXT, "
+            "output TEXT, lat REAL, stats TEXT, created REAL, "
+            "PRIMARY KEY (model_hash, prompt_hash, server_flags, filename))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS model_hashes (filename TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT)"
+        )
+        self.conn.commit()
+
+    def model_hash(self, model_path: Path) -> str:
+        # Hashing multi-GB weights is slow, so reuse the digest while size and mtime are unchanged.
+        # When the file is gone (e.g. --rescore on another box) fall back to the last recorded digest.
+        with self.lock:
+            row = self.conn.execute("SELECT size, mtime, sha256 FROM model_hashes WHERE filename = ?", (model_path.name,)).fetchone()
+        if not model_path.exists():
+            return row[2] if row else None
+        stat = model_path.stat()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO model_hashes VALUES (?, ?, ?, ?)",
+                              (model_path.name, stat.st_size, stat.st_mtime, digest.hexdigest()))
+            self.conn.commit()
+        return digest.hexdigest()
+
+    def get_many(self, key: tuple, filenames: List[str]) -> Dict[str, tuple]:
+        found = {}
+        with self.lock:
+            for i in range(0, len(filenames), 500):
+                chunk = filenames[i:i + 500]
+                rows = self.conn.execute(
+                    "SELECT filename, output, lat, stats FROM results WHERE model_hash = ? AND prompt_hash = ? AND server_flags = ? "
+                    f"AND filename IN ({','.join('?' * len(chunk))})", (*key, *chunk)
+                )
+                for filename, output, lat, stats in rows:
+                    found[filename] = (json.loads(output), lat, json.loads(stats))
+        return found
+
+    def put(self, key: tuple, filename: str, output: Dict[str, Any], lat: float, stats: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (*key, filename, json.dumps(output), lat, json.dumps(stats), time.time()))
+            self.conn.commit()
 
 class ShirariumBench:
     def __init__(self, port: int = 8080):
@@ -45,8 +199,28 @@ class ShirariumBench:
         self.models_dir.mkdir(exist_ok=True)
         self.reports_dir.mkdir(exist_ok=True)
         self.bin_dir.mkdir(exist_ok=True)
-        self.server_logs = []
+        self.server_log = ServerLog()  # bounded raw tail + timing/slot counters of the launched server
         self.hw = get_hardware_info()
+        self.prompt_cache = True
+        self.parallel = 1
+        self.slot_local = threading.local()
+        self.slot_lock = threading.Lock()
+        self.next_slot = 0
+        self.store = None
+        self.stream = False
+        self.slowest = 5
+        self.progress = True
+        self.server = None  # (launch key, process) of the llama-server owned by this bench
+        self.attached = False
+        self.served_model = None
+        self.http = threading.local()
+        self.vocab = Vocabulary()  # shared across runs so field codes compare between models
+        self.encoding = "json"  # output encoding requested from the model (see output_formats.py)
+        self.cascade = []  # confidence thresholds; empty sends every item to the LLM
+        self.server_config = dict(DEFAULT_SERVER_CONFIG)
+        self.draft_path = None  # draft model weights when server_config["draft"] is set
+        self.sample_interval = 1.0  # seconds between /proc samples of the launched server
+        self.downloader = None  # shared content-addressed model cache (created on first download)
 
     def ensure_llama_server(self) -> str:
         binary_name = "llama-server.exe" if os.name == 'nt' else "llama-server"
@@ -72,199 +246,875 @@ class ShirariumBench:
         return binary_name
 
     def download_model(self, model_info: Dict[str, Any]):
-        target = self.models_dir / model_info["filename"]
-        if target.exists() and target.stat().st_size > 1000000: return target
-
-        print(f"INFO: Downloading {model_info['name']}...")
-        hf_token = os.environ.get("HF_TOKEN")
-        # Use curl.exe directly on Windows to avoid PowerShell aliases
-        exe = "curl.exe" if os.name == 'nt' else "curl"
-        cmd = [exe, "-L", "-C", "-", "--progress-bar", model_info["url"], "-o", str(target)]
-        if hf_token: cmd.extend(["-H", f"Authorization: Bearer {hf_token}"])
-        subprocess.run(cmd)
-        return target
-
-    def start_server(self, model_path: Path, binary_path: str, n_gpu_layers: int = 0):
-        # Deterministic seed + Flash Attention + f16 KV
+        # Weights live in the shared cache; models/ holds links to them so server paths stay unchanged
+        if self.downloader is None: self.downloader = ModelDownloader()
+        return self.downloader.fetch(model_info, self.models_dir / model_info["filename"])
+
+    def prefetch_model(self, model_info: Dict[str, Any]):
+        if self.downloader is None: self.downloader = ModelDownloader()
+        self.downloader.prefetch(model_info, self.models_dir / model_info["filename"])
+
+    def server_flags(self, n_gpu_layers: int = 0, parallel: int = 1) -> List[str]:
+        # Deterministic seed + Flash Attention + f16 KV unless --sweep says otherwise
+        # llama-server splits ctx-size across slots, so scale it to keep `ctx` tokens per slot
+        config = self.server_config
+        flags = [
+            "--n-gpu-layers", str(n_gpu_layers),
+            "--ctx-size", str(config["ctx"] * parallel),
+            "--parallel", str(parallel),
+            "--flash-attn", config["flash_attn"],
+            "--cache-type-k", config["kv"],
+            "--cache-type-v", config["kv"],
+            "--seed", "42"
+        ]
+        # Only non-default knobs are added, so default runs keep their result-store key
+        if config["threads"]: flags += ["--threads", str(config["threads"]), "--threads-batch", str(config["threads"])]
+        if config["batch"]: flags += ["--batch-size", str(config["batch"])]
+        if config["ubatch"]: flags += ["--ubatch-size", str(config["ubatch"])]
+        if config["draft"] and self.draft_path:
+            flags += ["--model-draft", str(self.draft_path), "--draft-max", str(config["draft"]), "--gpu-layers-draft", str(n_gpu_layers)]
+        return flags
+
+    def start_server(self, model_path: Path, binary_path: str, n_gpu_layers: int = 0, parallel: int = 1,
+                     cpu_set: List[int] = None):
         cmd = [
             binary_path,
             "-m", str(model_path),
             "--port", str(self.port),
-            "--n-gpu-layers", str(n_gpu_layers),
-            "--ctx-size", "2048",
-            "--flash-attn", "on",
-            "--cache-type-k", "f16",
-            "--cache-type-v", "f16",
-            "--seed", "42",
-            "--log-disable"
+            *self.server_flags(n_gpu_layers, parallel)
         ]
-        self.server_logs = []
+        if cpu_set:
+            # Pin the instance to its own cores so concurrent servers don't contend
+            mask = sum(1 << core for core in cpu_set)
+            if not self.server_config["threads"]:
+                cmd += ["--threads", str(len(cpu_set)), "--threads-batch", str(len(cpu_set))]
+            cmd += ["--cpu-mask", f"{mask:x}", "--cpu-strict", "1"]
+        self.server_log = ServerLog()
+        self.parallel = parallel
         process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
             bufsize=1,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0
+            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0,
+            # Own process group, so stop_server's killpg never reaches the runner itself
+            start_new_session=os.name != 'nt'
         )
 
-        def log_reader(proc):
+        # Slot and timing lines become counters as they arrive; only the last LOG_LINES raw lines are kept
+        def log_reader(proc, log):
             for line in iter(proc.stdout.readline, ""):
-                self.server_logs.append(line.strip())
+                log.feed(line)
 
-        threading.Thread(target=log_reader, args=(process,), daemon=True).start()
+        threading.Thread(target=log_reader, args=(process, self.server_log), daemon=True).start()
 
-        for i in range(60):
+        # Poll quickly at first and back off, so small models aren't charged a fixed 2s per check
+        delay, deadline = 0.05, time.perf_counter() + 120
+        while time.perf_counter() < deadline:
             if process.poll() is not None:
-                raise Exception(f"Server exited with code {process.poll()}. Logs:\n" + "\n".join(self.server_logs[-10:]))
+                raise Exception(f"Server exited with code {process.poll()}. Logs:\n" + "\n".join(self.server_log.tail(10)))
             try:
                 if requests.get(f"{self.api_url}/health", timeout=1).status_code == 200:
                     return process
             except: pass
-            time.sleep(2)
+            time.sleep(delay)
+            delay = min(delay * 1.5, 1.0)
 
         process.kill()
-        raise Exception("Server timeout. Logs:\n" + "\n".join(self.server_logs[-20:]))
+        raise Exception("Server timeout. Logs:\n" + "\n".join(self.server_log.tail(20)))
+
+    def attach(self, url: str):
+        """Target an already-running llama-server instead of launching one."""
+        self.api_url = url.rstrip("/")
+        self.attached = True
+        try:
+            self.parallel = requests.get(f"{self.api_url}/props", timeout=5).json().get("total_slots", 1)
+        except: pass
+        try:
+            self.served_model = requests.get(f"{self.api_url}/v1/models", timeout=5).json()["data"][0]["id"]
+        except:
+            self.served_model = self.api_url
+
+    def acquire_server(self, model_path: Path, n_gpu_layers: int, parallel: int, cpu_set: List[int] = None) -> float:
+        """Ensure a server for this model/flags is running and return its load time (0 when reused or attached)."""
+        if self.attached: return 0.0
+        key = (str(model_path), tuple(self.server_flags(n_gpu_layers, parallel)), tuple(cpu_set or ()))
+        if self.server and self.server[0] == key and self.server[1].poll() is None:
+            return 0.0
+        self.release_server()
+        start_time = time.perf_counter()
+        process = self.start_server(model_path, self.ensure_llama_server(), n_gpu_layers, parallel, cpu_set)
+        self.server = (key, process)
+        return time.perf_counter() - start_time
+
+    def release_server(self):
+        if self.server:
+            self.stop_server(self.server[1])
+            self.server = None
+
+    def session(self) -> requests.Session:
+        # One keep-alive session per worker thread instead of a new connection per request
+        if not hasattr(self.http, "session"):
+            self.http.session = requests.Session()
+        return self.http.session
+
+    def slot_id(self) -> int:
+        # Pin each worker thread to one llama-server slot so its KV cache keeps the shared prefix
+        if not hasattr(self.slot_local, "slot"):
+            with self.slot_lock:
+                self.slot_local.slot = self.next_slot % self.parallel
+                self.next_slot += 1
+        return self.slot_local.slot
+
+    def stop_server(self, process):
+        if os.name == 'nt':
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
 
     def parse_with_llm(self, filename: str) -> Dict[str, Any]:
-        system_prompt = (
-            "You are a deterministic data extraction engine. Parse the provided media filename into a strict JSON object.\n"
-            "Rules:\n"
-            "- release_year: choose the release year (often in parentheses or near resolution).\n"
-            "- title: the name of the media, including title years if applicable.\n"
-            "- Use null for missing values. No conversational text."
-        )
+        messages = output_formats.prefix(self.encoding, False) + [{"role": "user", "content": f"Parse: {filename}"}]
+        result_text, latency, stats = self.complete(messages, output_formats.constraint(self.encoding, 1, False))
+        return output_formats.decode(self.encoding, result_text, 1, False)[0], latency, stats
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": "1984 (1984) 1080p BluRay.mkv"},
-            {"role": "assistant", "content": '{"Title": "1984", "Year": 1984, "Resolution": "1080p", "Season": null, "Episode": null}'},
-            {"role": "user", "content": "2012.2009.1080p.mkv"},
-            {"role": "assistant", "content": '{"Title": "2012", "Year": 2009, "Resolution": "1080p", "Season": null, "Episode": null}'},
-            {"role": "user", "content": f"Parse: {filename}"}
-        ]
-        schema = {
-            "type": "object",
-            "properties": {
-                "Title": {"type": "string"}, "Year": {"type": ["number", "null"]},
-                "Season": {"type": ["number", "null"]}, "Episode": {"type": ["number", "null"]},
-                "Resolution": {"type": ["string", "null"]}
-            },
-            "required": ["Title", "Year", "Season", "Episode", "Resolution"]
+    def parse_batch(self, filenames: List[str]) -> tuple:
+        """Parse several filenames in one request; returns one output per filename, the request latency and stats."""
+        prompt = "Parse:\n" + "\n".join(f"{i}. {name}" for i, name in enumerate(filenames, 1))
+        messages = output_formats.prefix(self.encoding, True) + [{"role": "user", "content": prompt}]
+        result_text, latency, stats = self.complete(messages, output_formats.constraint(self.encoding, len(filenames), True))
+        return output_formats.decode(self.encoding, result_text, len(filenames), True), latency, stats
+
+    def complete(self, messages: List[Dict[str, str]], constraint: Dict[str, Any]) -> tuple:
+        payload = {
+            "messages": messages,
+            "temperature": 0.0,
+            "seed": 42,
+            **constraint
         }
+        if self.prompt_cache:
+            payload["cache_prompt"] = True
+            payload["id_slot"] = self.slot_id()
+
+        if self.stream:
+            payload["stream"] = True
 
         start_time = time.perf_counter()
+        timings, ttft, chunks = {}, None, 0
         try:
-            response = requests.post(
-                f"{self.api_url}/v1/chat/completions",
-                json={
-                    "messages": messages,
-                    "temperature": 0.0,
-                    "seed": 42,
-                    "response_format": {"type": "json_object", "schema": schema}
-                },
-                timeout=60
-            )
-            result_text = response.json()["choices"][0]["message"]["content"]
+            if self.stream:
+                # Server-sent events: the first content delta gives TTFT, the final event carries timings
+                response = self.session().post(f"{self.api_url}/v1/chat/completions", json=payload, timeout=60, stream=True)
+                parts = []
+                for line in response.iter_lines():
+                    if not line.startswith(b"data: "): continue
+                    data = line[6:]
+                    if data == b"[DONE]": break
+                    event = json.loads(data)
+                    delta = (event.get("choices") or [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        if ttft is None: ttft = (time.perf_counter() - start_time) * 1000
+                        parts.append(delta)
+                        chunks += 1
+                    timings = event.get("timings") or timings
+                result_text = "".join(parts)
+            else:
+                response = self.session().post(f"{self.api_url}/v1/chat/completions", json=payload, timeout=60)
+                body = response.json()
+                result_text = body["choices"][0]["message"]["content"]
+                timings = body.get("timings") or {}
         except Exception as e:
             result_text = json.dumps({"error": str(e)})
+            failed = True
+        else:
+            failed = False
 
         latency = (time.perf_counter() - start_time) * 1000
-        try: parsed = json.loads(result_text)
-        except: parsed = {"error": "Invalid JSON"}
-        return parsed, latency
+
+        # Prefer the server's decode rate; fall back to streamed chunks over the post-TTFT window
+        decode_tps = None
+        if timings.get("predicted_ms"):
+            decode_tps = timings.get("predicted_n", 0) / timings["predicted_ms"] * 1000
+        elif ttft is not None and latency > ttft:
+            decode_tps = chunks / (latency - ttft) * 1000
+        return result_text, latency, {
+            "prompt_n": timings.get("prompt_n", 0),
+            "cache_n": timings.get("cache_n", 0),
+            "prompt_ms": timings.get("prompt_ms", 0.0),
+            "predicted_n": timings.get("predicted_n", 0),
+            "predicted_ms": timings.get("predicted_ms", 0.0),
+            # Speculative decoding: tokens the draft proposed and how many the target model accepted
+            "draft_n": timings.get("draft_n", 0),
+            "draft_accepted": timings.get("draft_n_accepted", 0),
+            "ttft_ms": ttft,
+            "decode_tps": decode_tps,
+            "failed": failed
+        }
 
     def calculate_score(self, expected: Dict[str, Any], actual: Dict[str, Any]) -> float:
-        fields = ["Title", "Year", "Season", "Episode", "Resolution"]
-        correct = 0
-        for f in fields:
-            exp_val = str(expected.get(f) or expected.get(f.lower()) or "").lower().strip()
-            act_val = str(actual.get(f) or actual.get(f.lower()) or "").lower().strip()
-            if not exp_val and not act_val: # Both null/empty
-                correct += 1
-            elif exp_val == act_val:
-                correct += 1
-        return correct / len(fields)
-
-    def run_benchmark(self, model_info: Dict[str, Any], dataset_path: str, n_gpu_layers: int = 0, limit: int = 0):
-        print(f"\n>>> Running: {model_info['name']}")
-        binary_path = self.ensure_llama_server()
-        model_path = self.download_model(model_info)
-        server_process = self.start_server(model_path, binary_path, n_gpu_layers)
+        return score_pair(expected, actual)
 
-        try:
-            with open(dataset_path, 'r', encoding='utf-8') as f:
-                items = json.load(f).get("entries", [])
-            if limit > 0: items = items[:limit]
-
-            total_lat, total_acc = 0, 0
-            for idx, item in enumerate(items):
-                filename = os.path.basename(item.get("relativePath", ""))
-                expected = item.get("expected") or item
-                actual, lat = self.parse_with_llm(filename)
-                acc = self.calculate_score(expected, actual)
-
-                # Visual progress
-                sys.stdout.write(f"\r  Progress: [{idx+1}/{len(items)}] {acc*100:>3.0f}% | {lat:>5.0f}ms | {filename[:40]}")
-                sys.stdout.flush()
-
-                total_lat += lat
-                total_acc += acc
-
-            avg_lat, avg_acc = total_lat / len(items), total_acc / len(items)
-            print(f"\n  Result: Acc={avg_acc*100:.1f}%, Latency={avg_lat:.0f}ms")
-            return {"id": model_info["id"], "name": model_info["name"], "acc": avg_acc, "lat": avg_lat}
-        finally:
-            if os.name == 'nt':
-                subprocess.call(['taskkill', '/F', '/T', '/PID', str(server_process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            else:
-                os.killpg(os.getpgid(server_process.pid), signal.SIGTERM)
+    def cache_key(self, model_path: Path, n_gpu_layers: int, parallel: int, batch: int = 1,
+                  concurrency: int = 0, cpu_set: List[int] = None) -> tuple:
+        """Store key covering everything that changes an item's output or latency; defaults add nothing to it."""
+        if self.attached:
+            # Weights and flags of an attached server are unknown; key on the model name it reports
+            model_hash, flags = f"attach:{self.served_model}", "attach"
+        else:
+            model_hash, flags = self.store.model_hash(model_path), " ".join(self.server_flags(n_gpu_layers, parallel))
+            # Pinned instances run with one thread per core of their set
+            if cpu_set: flags += f" --cpu-set {len(cpu_set)}"
+        if not model_hash: return None
+        # More requests in flight than slots queue inside the server
+        if concurrency > parallel: flags += f" --in-flight {concurrency}"
+        prompt = {"prefix": PROMPT_PREFIX, "schema": OUTPUT_SCHEMA, "temperature": 0.0, "seed": 42}
+        if batch > 1:
+            # Batched answers depend on K and on which filenames share a request, so they get their own entries
+            prompt.update(prefix=BATCH_PREFIX, batch=batch, packing="first-fit")
+        if self.encoding != "json":
+            prompt.update(prefix=output_formats.prefix(self.encoding, batch > 1), encoding=self.encoding,
+                          constraint=output_formats.constraint(self.encoding, batch, batch > 1))
+        # Streamed runs record TTFT and decode rate, which non-streamed entries lack
+        if self.stream: prompt["stream"] = True
+        # Without cache_prompt/id_slot every request pays the full prefill
+        if not self.prompt_cache: prompt["cache_prompt"] = False
+        prompt = json.dumps(prompt, sort_keys=True)
+        return (model_hash, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), flags)
 
-if __name__ == "__main__":
-    load_dotenv()
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--dataset", default="datasets/regression/tier-a-golden.json")
-    parser.add_argument("--limit", type=int, default=0, help="Limit items per model")
-    parser.add_argument("--model", help="Specific model ID (default: all)")
-    parser.add_argument("--ngl", type=int, default=99, help="Number of GPU layers")
-    parser.add_argument("--output", help="Specific output filename")
-    args = parser.parse_args()
+    def item_row(self, index: int, filename: str, actual: Dict[str, Any], lat: float, stats: Dict[str, Any]) -> Dict[str, Any]:
+        # "actual" is moved into the run's ScoreTable by the main thread; scoring happens once at the end
+        return {"index": index, "filename": filename, "lat": lat, "ttft_ms": None, "decode_tps": None, **stats, "actual": actual}
 
-    with open("shirariumbench/models.json", 'r') as f: manifest = json.load(f)
-    bench = ShirariumBench()
+    def heuristic_item(self, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        guess = heuristic_parser.parse(item.get("relativePath", ""))
+        ms = (time.perf_counter() - start) * 1000
+        return {"index": index, "conf": guess["Confidence"], "known": guess["MediaType"] != "unknown", "ms": ms, "actual": guess}
 
-    models = [m for m in manifest["models"] if not args.model or m["id"] == args.model]
+    def escalates(self, row: Dict[str, Any], threshold: float) -> bool:
+        # Same rule as the plugin's EngineClient: unsure or untyped heuristic results go to the LLM
+        return not row["known"] or row["conf"] < threshold
 
-    print(f"--- ShirariumBench Automation ---")
-    print(f"Dataset: {args.dataset} (Limit: {args.limit if args.limit > 0 else 'All'})")
-    print(f"Hardware: {bench.hw['cpu']} | {bench.hw['gpu']}")
-    print(f"Models to test: {len(models)}")
+    def summarize_cascade(self, heuristics: List[Dict[str, Any]], results: List[Dict[str, Any]], concurrency: int, batch: int = 1) -> Dict[str, Any]:
+        count = len(heuristics)
+        llm = {r["index"]: r for r in results}
+        heuristic_s = sum(h["ms"] for h in heuristics) / 1000
+        rows = []
+        for threshold in self.cascade:
+            # Escalated items without an LLM answer (skipped by --rescore) keep the heuristic result, as the plugin does
+            escalated = [h["index"] for h in heuristics if self.escalates(h, threshold) and h["index"] in llm]
+            picked = set(escalated)
+            acc = sum(llm[h["index"]]["acc"] if h["index"] in picked else h["acc"] for h in heuristics) / count
+            # Modeled, not measured: each escalated item's latency spread over the requests kept in flight (and the items
+            # sharing a request); the run itself only timed the LLM over the items escalated at the highest threshold
+            llm_s = sum(llm[i]["lat"] for i in escalated) / 1000 / max(1, concurrency) / batch
+            total_s = heuristic_s + llm_s
+            rows.append({"threshold": threshold, "escalated": len(escalated) / count, "acc": acc,
+                         "projected_items_per_s": count / total_s if total_s > 0 else None})
+        return {
+            "heuristic_acc": sum(h["acc"] for h in heuristics) / count,
+            "heuristic_ms": heuristic_s * 1000 / count,
+            "heuristic_throughput": count / heuristic_s if heuristic_s > 0 else None,
+            "rows": rows
+        }
+
+    def evaluate_item(self, index: int, item: Dict[str, Any], key: tuple = None) -> Dict[str, Any]:
+        filename = os.path.basename(item.get("relativePath", ""))
+        actual, lat, stats = self.parse_with_llm(filename)
+        # Transport failures are not cached so that a resumed run retries them
+        if key and not stats["failed"]:
+            self.store.put(key, filename, actual, lat, stats)
+        return self.item_row(index, filename, actual, lat, stats)
+
+    def evaluate_batch(self, entries: List[tuple], key: tuple = None) -> List[Dict[str, Any]]:
+        filenames = [os.path.basename(item.get("relativePath", "")) for _, item in entries]
+        outputs, lat, stats = self.parse_batch(filenames)
+        # Every item waited for the whole request; token counts and server time are shared out evenly
+        share = {k: v / len(entries) for k, v in stats.items() if k in ("prompt_n", "cache_n", "prompt_ms", "predicted_n", "predicted_ms")}
+        stats = {**stats, **share}
+        results = []
+        for (index, item), filename, actual in zip(entries, filenames, outputs):
+            if key and not stats["failed"]:
+                self.store.put(key, filename, actual, lat, stats)
+            results.append(self.item_row(index, filename, actual, lat, stats))
+        return results
+
+    def summarize(self, results: List[Dict[str, Any]], fresh: int, wall_time: float) -> Dict[str, Any]:
+        count = len(results)
+        # Split latency into prefill (prompt eval) and decode using the server-side timings
+        prompt_tokens = sum(r["prompt_n"] + r["cache_n"] for r in results)
+        latencies = [r["lat"] for r in results]
+        ttfts = [r["ttft_ms"] for r in results if r["ttft_ms"] is not None]
+        rates = [r["decode_tps"] for r in results if r["decode_tps"]]
+        slowest = sorted(results, key=lambda r: -r["lat"])[:self.slowest]
+        decode_ms = sum(r["predicted_ms"] for r in results)
+        drafted = sum(r.get("draft_n", 0) for r in results)
+        return {
+            "acc": sum(r["acc"] for r in results) / count,
+            **breakdown(results),
+            "lat": sum(latencies) / count,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+            "ttft_p50": percentile(ttfts, 50) if ttfts else None,
+            "ttft_p99": percentile(ttfts, 99) if ttfts else None,
+            "decode_tps": sum(rates) / len(rates) if rates else None,
+            "slowest": [{"filename": r["filename"], "lat": r["lat"], "prompt": f"Parse: {r['filename']}"} for r in slowest],
+            "prefill": sum(r["prompt_ms"] for r in results) / count,
+            "decode": sum(r["predicted_ms"] for r in results) / count,
+            # Generated tokens per item: what compact output encodings are meant to cut
+            "gen_tokens": sum(r["predicted_n"] for r in results) / count,
+            "gen_tps": sum(r["predicted_n"] for r in results) / decode_ms * 1000 if decode_ms else None,
+            "draft_accept": sum(r.get("draft_accepted", 0) for r in results) / drafted if drafted else None,
+            "cache_hit": sum(r["cache_n"] for r in results) / prompt_tokens if prompt_tokens else 0,
+            # Throughput only covers items inferred in this run; cached items cost no wall time
+            "throughput": fresh / wall_time if fresh and wall_time > 0 else None,
+            "cached": count - fresh,
+            "infer_s": wall_time,
+            "items": results
+        }
+
+    def run_benchmark(self, model_info: Dict[str, Any], dataset_path: str, n_gpu_layers: int = 0, limit: int = 0,
+                      concurrency: int = 1, parallel: int = 0, rescore: bool = False, cpu_set: List[int] = None,
+                      offset: int = 0, shard: tuple = (0, 1), chunk_size: int = 1024, batch: int = 1, encoding: str = "json",
+                      items: List[tuple] = None):
+        print(f"\n>>> Running: {model_info['name']} on {dataset_path}" + (f" (shard {shard[0]}/{shard[1]})" if shard[1] > 1 else "")
+              + (f" (batch {batch})" if batch > 1 else "") + (f" ({encoding} output)" if encoding != "json" else "")
+              + (f" (draft {self.server_config['draft']})" if self.server_config["draft"] else ""))
+        self.encoding = encoding
+        parallel = parallel or concurrency
+
+        # Rescoring works from cached outputs alone, so it never downloads weights or starts a server
+        local_only = rescore or self.attached
+        model_path = self.models_dir / model_info["filename"] if local_only else self.download_model(model_info)
+        # Speculative decoding: the entry's draft model proposes up to server_config["draft"] tokens per step
+        draft = model_info.get("draft") if self.server_config["draft"] else None
+        if self.server_config["draft"] and not draft:
+            raise Exception(f"{model_info['name']} declares no draft model in models.json")
+        self.draft_path = (self.models_dir / draft["filename"] if local_only else self.download_model(draft)) if draft else None
+        key = self.cache_key(model_path, n_gpu_layers, parallel, batch, concurrency, cpu_set) if self.store else None
+
+        # Items are streamed in chunks so memory stays flat no matter how large the dataset is;
+        # only the compact per-item results are kept for the summary
+        results, fresh, skipped, wall_time, load_s, sampler = [], 0, 0, 0.0, None, None
+        heuristics, escalate_at = [], max(self.cascade, default=None)
+        # Expectations and outputs are collected as integer columns and scored in one pass after the run
+        table, heuristic_table = ScoreTable(self.vocab), ScoreTable(self.vocab)
+        self.slot_local, self.next_slot = threading.local(), 0
+        # `items` holds (index, entry) pairs already selected by the caller, which saves re-reading the dataset
+        window = iter(items) if items is not None else select_window(dataset_path, offset, limit, shard)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            while True:
+                chunk = list(islice(window, chunk_size))
+                if not chunk: break
+                filenames = [os.path.basename(item.get("relativePath", "")) for _, item in chunk]
+                cached = self.store.get_many(key, filenames) if key else {}
+
+                chunk_results = [None] * len(chunk)
+                pending, guesses = [], []
+                for pos, ((idx, item), filename) in enumerate(zip(chunk, filenames)):
+                    if escalate_at is not None:
+                        # Cascade: only items the heuristic pre-pass is unsure about reach the LLM
+                        row = self.heuristic_item(idx, item)
+                        guesses.append((item.get("expected") or item, row.pop("actual")))
+                        heuristics.append(row)
+                        if not self.escalates(row, escalate_at): continue
+                    if filename in cached:
+                        # Flagged so `--compare` can leave replayed latencies out of its statistics
+                        chunk_results[pos] = {**self.item_row(idx, filename, *cached[filename]), "cached": True}
+                    else:
+                        pending.append(pos)
+
+                if pending and rescore:
+                    skipped += len(pending)
+                elif pending:
+                    if load_s is None:
+                        # The server stays up after this dataset; callers release it once the model is done
+                        load_s = self.acquire_server(model_path, n_gpu_layers, parallel, cpu_set)
+                        if load_s: print(f"  Model loaded in {load_s:.1f}s")
+                        # Memory, CPU, faults and context switches of the server tree while this run infers
+                        if self.server:
+                            sampler = ResourceSampler(self.server[1].pid, self.sample_interval, cpu_set).start()
+                            self.server_log.reset()
+
+                    # Keep `concurrency` requests in flight; results are stored by dataset position
+                    start_time = time.perf_counter()
+                    if batch > 1:
+                        batches = pack_batches([(filenames[pos], pos) for pos in pending], batch)
+                        futures = {pool.submit(self.evaluate_batch, [chunk[pos] for _, pos in b], key): [pos for _, pos in b] for b in batches}
+                    else:
+                        futures = {pool.submit(self.evaluate_item, *chunk[pos], key): [pos] for pos in pending}
+                    for future in as_completed(futures):
+                        done = future.result()
+                        for pos, res in zip(futures[future], done if batch > 1 else [done]):
+                            chunk_results[pos] = res
+                        fresh += len(futures[future])
+
+                        # Visual progress
+                        if not self.progress: continue
+                        sys.stdout.write(f"\r  Progress: [{fresh}] {res['lat']:>5.0f}ms | {res['filename'][:40]}")
+                        sys.stdout.flush()
+                    wall_time += time.perf_counter() - start_time
+                expected, actual = [], []
+                for (_, item), res in zip(chunk, chunk_results):
+                    if not res: continue
+                    expected.append(item.get("expected") or item)
+                    actual.append(res.pop("actual"))
+                    res["tags"] = item.get("tags") or []
+                    results.append(res)
+                table.add(expected, actual)
+                if guesses: heuristic_table.add(*zip(*guesses))
+
+        resources = sampler.stop() if sampler else {}
+        server_metrics = self.server_log.snapshot() if sampler else {}
+        for rows, scored in ((results, table), (heuristics, heuristic_table)):
+            for row, (mask, acc) in zip(rows, zip(*scored.score())):
+                row["fields"], row["acc"] = mask, acc
+        if not results:
+            if heuristics: print(f"  No items escalated to the LLM below confidence {escalate_at}")
+            return None
+        summary = self.summarize(results, fresh, wall_time)
+        if resources:
+            summary.update(resources=resources, rss_peak=resources["rss_peak"], cpu_item=resources["cpu_s"] / fresh if fresh else None)
+        if server_metrics:
+            # Server-side view of the same run, parsed from llama-server's slot timing lines
+            summary.update(server_metrics=server_metrics, server=rates(server_metrics))
+        if heuristics:
+            summary["cascade"] = self.summarize_cascade(heuristics, results, concurrency, batch)
+        if rescore:
+            if skipped: print(f"  Skipped {skipped} items with no cached output")
+            print(f"  Result ({model_info['id']}): Acc={summary['acc']*100:.1f}%, Latency={summary['lat']:.0f}ms (rescored {len(results)} cached items)")
+        else:
+            if summary["cached"]: print(f"\n  Resumed: {summary['cached']} cached, {fresh} evaluated")
+            throughput = f"{summary['throughput']:.2f} items/s" if summary["throughput"] else "n/a (all cached)"
+            print(f"\n  Result ({model_info['id']}): Acc={summary['acc']*100:.1f}%, Latency={summary['lat']:.0f}ms (prefill {summary['prefill']:.0f}ms, decode {summary['decode']:.0f}ms), "
+                  f"p50/p90/p99={summary['p50']:.0f}/{summary['p90']:.0f}/{summary['p99']:.0f}ms, Cache={summary['cache_hit']*100:.0f}%, Throughput={throughput}, Inference={wall_time:.1f}s")
+            if server_metrics:
+                server = summary["server"]
+                print(f"  Server: prompt eval {server['prompt_tps'] or 0:.0f} tok/s, eval {server['eval_tps'] or 0:.1f} tok/s"
+                      + (f", KV prefix reused {server['cache_hit']*100:.0f}%" if server["cache_hit"] is not None else "")
+                      + (f", slot reuse {server['slot_reuse']*100:.0f}%" if server["slot_reuse"] is not None else ""))
+            accept = summary["draft_accept"] if summary["draft_accept"] is not None else summary.get("server", {}).get("draft_accept")
+            if accept is not None:
+                print(f"  Speculative: draft {self.server_config['draft']} accepted {accept*100:.0f}%, {summary['gen_tps'] or 0:.1f} gen tok/s")
+            if resources:
+                print(f"  Resources: peak RSS {resources['rss_peak'] / 1024**3:.2f}GB, CPU {resources['cpu_s']:.1f}s"
+                      + (f" ({summary['cpu_item']:.3f}s/item)" if summary["cpu_item"] else ""))
+        for row in summary.get("cascade", {}).get("rows", []):
+            print(f"  Cascade @{row['threshold']:.2f}: escalated {row['escalated']*100:.1f}%, Acc={row['acc']*100:.1f}%, projected {row['projected_items_per_s'] or 0:.1f} items/s")
+        return {"id": model_info["id"], "name": model_info["name"], "dataset": dataset_path, "batch": batch, "encoding": encoding,
+                "family": model_info.get("family", model_info["id"]), "quant": model_info.get("quant"),
+                "draft": self.server_config["draft"], "draft_model": draft["name"] if draft else None,
+                "model_bytes": model_path.stat().st_size if model_path.is_file() else None, "load_s": load_s, **summary}
+
+def benchmark_model(bench: ShirariumBench, model_info: Dict[str, Any], args, cpu_set: List[int] = None) -> List[Dict[str, Any]]:
+    """Run one model over every --dataset, --batch size and --encoding, loading its weights once per draft setting."""
+    results = []
+    # --speculative: models with a draft run without it first (the baseline), then at each draft length
+    drafts = [0, *args.speculative] if args.speculative and model_info.get("draft") else [0]
+    try:
+        for draft in drafts:
+            bench.server_config["draft"] = draft
+            for dataset, batch, encoding in product(args.dataset, args.batch, args.encoding):
+                res = bench.run_benchmark(model_info, dataset, n_gpu_layers=args.ngl, limit=args.limit,
+                                          concurrency=args.concurrency, parallel=args.parallel, rescore=args.rescore,
+                                          cpu_set=cpu_set, offset=args.offset, shard=args.shard, batch=batch, encoding=encoding)
+                if res: results.append(res)
+    finally:
+        bench.server_config["draft"] = 0
+        bench.release_server()
+    return results
+
+# --sweep axes and how their values are parsed; "parallel" is a launch argument rather than a config knob
+SWEEP_AXES = {"threads": int, "batch": int, "ubatch": int, "ctx": int, "parallel": int, "kv": str, "flash_attn": str, "draft": int}
+
+def parse_sweep(specs: List[str], hw: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Expand 'axis=v1,v2' specs into every combination; threads also accepts 'cores' and 'logical'."""
+    axes = {}
+    for spec in specs:
+        axis, _, values = spec.partition("=")
+        if axis not in SWEEP_AXES or not values:
+            raise ValueError(f"Invalid sweep axis {spec}: expected {'|'.join(SWEEP_AXES)}=v1,v2,...")
+        named = {"cores": hw["cores"], "logical": hw["usable_threads"]} if axis == "threads" else {}
+        axes[axis] = list(dict.fromkeys(named[v] if v in named else SWEEP_AXES[axis](v) for v in values.split(",")))
+    # Without a threads axis, compare physical cores with every usable hardware thread
+    axes.setdefault("threads", list(dict.fromkeys(t for t in (hw["cores"], hw["usable_threads"]) if t)))
+    return [dict(zip(axes, combo)) for combo in product(*axes.values())]
+
+def sweep_label(config: Dict[str, Any]) -> str:
+    return (f"t{config['threads'] or 'auto'} b{config['batch'] or 'auto'} ub{config['ubatch'] or 'auto'} "
+            f"ctx{config['ctx']} p{config['parallel']} {config['kv']}" + ("" if config["flash_attn"] == "on" else f" fa={config['flash_attn']}")
+            + (f" draft{config['draft']}" if config.get("draft") else ""))
+
+def pareto_front(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Configurations no other one beats on p50 latency, throughput and peak RSS at once."""
+    def cost(p): return (p["p50"], -(p["throughput"] or 0), p.get("rss_peak") or 0)
+    def dominates(a, b): return a != b and all(x <= y for x, y in zip(a, b))
+    return [p for p in points if not any(dominates(cost(o), cost(p)) for o in points)]
 
+def run_sweep(bench: ShirariumBench, model_info: Dict[str, Any], args, grid: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Benchmark one model on the first --dataset under every server configuration in the grid."""
     summaries = []
-    for m in models:
+    for step, point in enumerate(grid, 1):
+        config = {**DEFAULT_SERVER_CONFIG, "parallel": args.parallel or args.concurrency, **point}
+        parallel = config["parallel"]
+        bench.server_config = {k: v for k, v in config.items() if k != "parallel"}
+        print(f"\n=== Sweep {step}/{len(grid)}: {sweep_label(config)}")
         try:
-            res = bench.run_benchmark(m, args.dataset, n_gpu_layers=args.ngl, limit=args.limit)
-            if res: summaries.append(res)
+            # Keep every slot busy, otherwise extra --parallel slots can't show up in throughput
+            res = bench.run_benchmark(model_info, args.dataset[0], n_gpu_layers=args.ngl, limit=args.limit,
+                                      concurrency=max(args.concurrency, parallel), parallel=parallel,
+                                      offset=args.offset, shard=args.shard, batch=args.batch[0], encoding=args.encoding[0])
+            if res:
+                res.update(config=config, flags=" ".join(bench.server_flags(args.ngl, parallel)))
+                summaries.append(res)
         except Exception as e:
-            print(f"\n!! Failed {m['name']}: {e}")
+            print(f"\n!! Failed {sweep_label(config)}: {e}")
+        finally:
+            bench.release_server()
+    bench.server_config = dict(DEFAULT_SERVER_CONFIG)
+    return summaries
+
+def combine_runs(bench: ShirariumBench, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One summary from several runs of the same model over disjoint item slices (adaptive rounds)."""
+    items = sorted((item for r in runs for item in r["items"]), key=lambda item: item["index"])
+    fresh = len(items) - sum(r["cached"] for r in runs)
+    summary = bench.summarize(items, fresh, sum(r["infer_s"] for r in runs))
+    first = runs[0]
+    combined = {"id": first["id"], "name": first["name"], "dataset": first["dataset"], "batch": first["batch"], "encoding": first["encoding"],
+                "family": first.get("family", first["id"]), "quant": first.get("quant"), "model_bytes": first.get("model_bytes"),
+                "draft": first.get("draft", 0), "draft_model": first.get("draft_model"), "load_s": next((r["load_s"] for r in runs if r["load_s"]), first["load_s"]), **summary}
+    resources = merge_resources([r.get("resources") for r in runs])
+    if resources:
+        combined.update(resources=resources, rss_peak=resources["rss_peak"], cpu_item=resources["cpu_s"] / fresh if fresh else None)
+    server_metrics = merge_metrics([r.get("server_metrics") for r in runs])
+    if server_metrics:
+        combined.update(server_metrics=server_metrics, server=rates(server_metrics))
+    return combined
+
+def dominated(loser: List[Dict[str, Any]], leader: List[Dict[str, Any]], confidence: float) -> bool:
+    """True when `leader` is significantly more accurate and not significantly slower than `loser`."""
+    _, _, loser_acc_high = mean_ci([r["acc"] for r in loser], confidence)
+    _, leader_acc_low, _ = mean_ci([r["acc"] for r in leader], confidence)
+    _, _, loser_lat_high = mean_ci([r["lat"] for r in loser], confidence)
+    _, leader_lat_low, _ = mean_ci([r["lat"] for r in leader], confidence)
+    return leader_acc_low > loser_acc_high and leader_lat_low <= loser_lat_high
+
+def run_adaptive(bench: ShirariumBench, models: List[Dict[str, Any]], args) -> List[Dict[str, Any]]:
+    """Run models over randomly ordered, evenly spread item slices and stop sampling a model once another dominates it."""
+    rng = random.Random(42)
+    summaries = []
+    for dataset, batch, encoding in product(args.dataset, args.batch, args.encoding):
+        # Read the window once; slice s is every rounds-th item from position s, so each slice spans the whole dataset
+        window = list(select_window(dataset, args.offset, args.limit))
+        total = len(window)
+        rounds = max(1, -(-total // args.adaptive))
+        slices = [window[s::rounds] for s in range(rounds)]
+        runs = {m["id"]: [] for m in models}
+        status = {}
+        orders = {}
+        for m in models:
+            orders[m["id"]] = list(range(rounds))
+            rng.shuffle(orders[m["id"]])
+        print(f"\n=== Adaptive: {Path(dataset).stem}, {total} items in up to {rounds} rounds of ~{args.adaptive} ===")
 
-    # Sorting: Highest Accuracy first, then lowest Latency
-    summaries.sort(key=lambda x: (-x["acc"], x["lat"]))
+        def items_of(m):
+            return [item for r in runs[m["id"]] for item in r["items"]]
+
+        def run_slice(m, shard):
+            try:
+                res = bench.run_benchmark(m, dataset, n_gpu_layers=args.ngl, limit=args.limit, concurrency=args.concurrency,
+                                          parallel=args.parallel, rescore=args.rescore, offset=args.offset,
+                                          shard=(shard, rounds), batch=batch, encoding=encoding, items=slices[shard])
+                if res: runs[m["id"]].append(res)
+                return True
+            except Exception as e:
+                print(f"\n!! Failed {m['name']}: {e}")
+                status[m["id"]] = "failed"
+                return False
+
+        def leader_of(m):
+            # Sequential test against every other model measured so far, most accurate first
+            items = items_of(m)
+            if len(items) < args.adaptive_min: return None
+            others = sorted((o for o in models if o is not m and status.get(o["id"]) != "failed"
+                             and len(items_of(o)) >= args.adaptive_min),
+                            key=lambda o: -mean([item["acc"] for item in items_of(o)]))
+            return next((o for o in others if dominated(items, items_of(o), args.adaptive_confidence)), None)
+
+        def pilot_mean(m):
+            items = items_of(m)
+            return mean([item["acc"] for item in items]) if items else 0.0
+
+        # Pilot: one slice per model, so every model has a first estimate before any is run further
+        for pos, m in enumerate(models):
+            if pos + 1 < len(models) and not args.rescore:
+                bench.prefetch_model(models[pos + 1])
+            run_slice(m, orders[m["id"]][0])
+            bench.release_server()
+
+        # Then the rest, most promising pilot first: strong models are measured early and can stop the others
+        ranked = sorted((m for m in models if status.get(m["id"]) is None), key=pilot_mean, reverse=True)
+        for pos, m in enumerate(ranked):
+            if pos + 1 < len(ranked) and not args.rescore:
+                bench.prefetch_model(ranked[pos + 1])
+            for round_no, shard in enumerate(orders[m["id"]][1:], 2):
+                leader = leader_of(m)
+                if leader:
+                    status[m["id"]] = f"stopped after round {round_no - 1}/{rounds}, dominated by {leader['name']}"
+                    print(f"  Adaptive: stopping {m['name']} after {len(items_of(m))} items (dominated by {leader['name']})")
+                    break
+                if not run_slice(m, shard): break
+            bench.release_server()
+
+        for m in models:
+            if not runs[m["id"]]: continue
+            combined = combine_runs(bench, runs[m["id"]])
+            _, acc_low, acc_high = mean_ci([item["acc"] for item in combined["items"]], args.adaptive_confidence)
+            _, lat_low, lat_high = mean_ci([item["lat"] for item in combined["items"]], args.adaptive_confidence)
+            combined["adaptive"] = {"items": len(combined["items"]), "total": total, "status": status.get(m["id"], "completed"),
+                                    "acc_ci": [acc_low, acc_high], "lat_ci": [lat_low, lat_high]}
+            summaries.append(combined)
+    return summaries
+
+def estimate_footprint(model_path: Path, parallel: int) -> int:
+    # Weights are mmapped in full; allow ~256 MiB per slot for KV cache and compute buffers
+    size = model_path.stat().st_size if model_path.exists() else 0
+    return size + 256 * 1024**2 * max(1, parallel)
+
+def run_instances(benches: List[ShirariumBench], models: List[Dict[str, Any]], args, ram_budget: int) -> List[Dict[str, Any]]:
+    """Benchmark models concurrently, one llama-server per bench (own port and pinned core set)."""
+    queue = Queue()
+    for m in models: queue.put(m)
+    gate = MemoryGate(ram_budget)
+    summaries = []
+
+    def worker(bench: ShirariumBench, cores: List[int]):
+        while True:
+            try: m = queue.get_nowait()
+            except Empty: return
+            need = 0
+            try:
+                if not args.rescore:
+                    # Fetch the next queued model while this one runs
+                    upcoming = list(queue.queue)[:1]
+                    if upcoming: bench.prefetch_model(upcoming[0])
+                    need = estimate_footprint(bench.download_model(m), args.parallel or args.concurrency)
+                gate.acquire(need)
+                try:
+                    summaries.extend(benchmark_model(bench, m, args, cores))
+                finally:
+                    gate.release(need)
+            except Exception as e:
+                print(f"\n!! Failed {m['name']}: {e}")
+
+    threads = [threading.Thread(target=worker, args=(bench, cores))
+               for bench, cores in zip(benches, partition_cores(len(benches)))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return summaries
+
+# Per-item columns of the CSV artifact (the JSONL sidecar keeps every key)
+CSV_COLUMNS = ["id", "dataset", "batch", "encoding", "draft", "index", "filename", "acc", "fields", "lat", "ttft_ms", "decode_tps",
+               "prompt_n", "cache_n", "prompt_ms", "predicted_n", "predicted_ms", "draft_n", "draft_accepted", "cached", "tags"]
+
+def write_report(bench: ShirariumBench, summaries: List[Dict[str, Any]], manifest: Dict[str, Any], args):
+    # Sorting: Dataset order, then highest Accuracy first, then lowest Latency
+    summaries.sort(key=lambda x: (args.dataset.index(x["dataset"]), -x["acc"], x["lat"]))
+    multi_dataset = len(args.dataset) > 1
+    batched = args.batch != [1]
+    encoded = args.encoding != ["json"]
 
     # Generate Markdown Report
     report_content = [
         f"# ShirariumBench Results\n",
         f"- **Date**: {time.strftime('%Y-%m-%d %H:%M:%S')}",
-        f"- **Dataset**: `{args.dataset}` (Limit: {args.limit})",
-        f"- **Hardware**: `{bench.hw['cpu']}` | `{bench.hw['gpu']}` | `{bench.hw['os']}`",
-        f"- **Config**: NGL={args.ngl}, Seed=42, Temperature=0.0\n",
-        "| Model | Accuracy | Latency | Params | Quant |",
-        "| :--- | :--- | :--- | :--- | :--- |"
+        f"- **Dataset**: {', '.join(f'`{d}`' for d in args.dataset)} (Limit: {args.limit}, Offset: {args.offset}"
+        + (f", Shard: {args.shard[0]}/{args.shard[1]}" if args.shard[1] > 1 else "")
+        + (f", merged from {len(args.merge)} shard reports" if args.merge else "") + ")",
+        f"- **Hardware**: `{bench.hw['cpu']}` ({bench.hw['cores']} cores / {bench.hw['usable_threads']} threads, {bench.hw['ram']} RAM) | `{bench.hw['gpu']}` | `{bench.hw['os']}`"
+        + (f" | ISA: {' '.join(bench.hw['isa'])}" if bench.hw.get("isa") else ""),
+        f"- **Config**: NGL={args.ngl}, Seed=42, Temperature=0.0, Concurrency={args.concurrency}, Parallel={args.parallel or args.concurrency}, PromptCache={bench.prompt_cache}, Stream={bench.stream}, Instances={args.instances}"
+        + (f", Batch={'/'.join(str(k) for k in args.batch)}" if batched else "")
+        + (f", Encoding={'/'.join(args.encoding)}" if encoded else "")
+        + (f", FakeServer={args.fake_server}" if args.fake_server else "")
+        + (f", Cascade={'/'.join(str(t) for t in args.cascade)} (table covers escalated items only)" if args.cascade else "") + "\n",
+        ("| Dataset " if multi_dataset else "") + "| Model " + ("| Batch " if batched else "") + ("| Encoding " if encoded else "")
+        + "| Accuracy | Latency | p50 | p90 | p99 | Max | TTFT p50 | Decode tok/s | Gen tok/item | Prefill | Decode | Cache Hit | Throughput | Peak RSS | CPU s/item | Load | Params | Quant |",
+        ("| :--- " if multi_dataset else "") + ("| :--- " if batched else "") + ("| :--- " if encoded else "") + "| :--- " * 19 + "|"
     ]
 
     for r in summaries:
-        m_meta = next(m for m in manifest["models"] if m["id"] == r["id"])
-        report_content.append(f"| {r['name']} | {r['acc']*100:.1f}% | {r['lat']:.0f}ms | {m_meta['parameters']} | {m_meta['quant']} |")
+        m_meta = next((m for m in manifest["models"] if m["id"] == r.get("family", r["id"])), {})
+        throughput = f"{r['throughput']:.2f}/s" if r["throughput"] else "-"
+        ttft = f"{r['ttft_p50']:.0f}ms" if r["ttft_p50"] is not None else "-"
+        tps = f"{r['decode_tps']:.1f}" if r["decode_tps"] else "-"
+        # Weights load once per model, so later datasets show the server as reused
+        load = f"{r['load_s']:.1f}s" if r["load_s"] else ("attached" if args.attach else "reused" if r["load_s"] == 0 else "-")
+        dataset_cell = f"| {Path(r['dataset']).stem} " if multi_dataset else ""
+        batch_cell = f"| {r.get('batch', 1)} " if batched else ""
+        encoding_cell = f"| {r.get('encoding', 'json')} " if encoded else ""
+        gen = f"{r['gen_tokens']:.1f}" if r.get("gen_tokens") else "-"
+        rss = f"{r['rss_peak'] / 1024**3:.2f}GB" if r.get("rss_peak") else "-"
+        cpu = f"{r['cpu_item']:.3f}" if r.get("cpu_item") else "-"
+        draft_cell = f" draft{r['draft']}" if r.get("draft") else ""
+        report_content.append(f"{dataset_cell}| {r['name']}{draft_cell} {batch_cell}{encoding_cell}| {r['acc']*100:.1f}% | {r['lat']:.0f}ms | {r['p50']:.0f}ms | {r['p90']:.0f}ms | {r['p99']:.0f}ms | {r['max']:.0f}ms | {ttft} | {tps} | {gen} | {r['prefill']:.0f}ms | {r['decode']:.0f}ms | {r['cache_hit']*100:.0f}% | {throughput} | {rss} | {cpu} | {load} | {m_meta.get('parameters', '-')} | {r.get('quant') or m_meta.get('quant', '-')} |")
+
+    # Comparison matrices: one column per model run, so weak fields and filename styles stand out
+    def label(r):
+        return (r["name"] + (f" ({Path(r['dataset']).stem})" if multi_dataset else "") + (f" K={r.get('batch', 1)}" if batched else "")
+                + (f" {r.get('encoding', 'json')}" if encoded else "")
+                + (f" [{sweep_label(r['config'])}]" if r.get("config") else f" draft{r['draft']}" if r.get("draft") else ""))
+    scored = [r for r in summaries if r.get("fields")]
+    if scored:
+        header = "| " + " | ".join(label(r) for r in scored) + " |"
+        align = "| :--- " * len(scored) + "|"
+        report_content += ["", "## Field Accuracy", "", "| Field " + header, "| :--- " + align]
+        for f in FIELDS:
+            report_content.append(f"| {f} | " + " | ".join(f"{r['fields'][f]*100:.1f}%" for r in scored) + " |")
+        tags = sorted({t for r in scored for t in r.get("tags", {})})
+        if tags:
+            report_content += ["", "## Tag Accuracy", "", "| Tag " + header, "| :--- " + align]
+            for t in tags:
+                cells = [f"{r['tags'][t]*100:.1f}%" if t in r.get("tags", {}) else "-" for r in scored]
+                report_content.append(f"| {t} | " + " | ".join(cells) + " |")
+
+    # Tail latency drives plugin timeouts, so list the slowest filenames with the prompt that was sent
+    if summaries and args.slowest > 0:
+        report_content += ["", "## Slowest Items", "", "| Model | Latency | Filename | Prompt |", "| :--- | :--- | :--- | :--- |"]
+        for r in summaries:
+            for item in r["slowest"]:
+                report_content.append(f"| {r['name']} | {item['lat']:.0f}ms | `{item['filename']}` | `{item['prompt']}` |")
+
+    # Adaptive races: how much of the dataset each model needed before it finished or was dominated
+    raced = [r for r in summaries if r.get("adaptive")]
+    if raced:
+        used = sum(r["adaptive"]["items"] for r in raced)
+        full = sum(r["adaptive"]["total"] for r in raced)
+        report_content += ["", "## Adaptive Stopping", "", f"{used} of {full} model-items evaluated ({used / full * 100:.0f}%), "
+                           f"{args.adaptive_confidence * 100:.0f}% intervals.", "",
+                           "| Model | Items | Accuracy CI | Latency CI | Status |", "| :--- | :--- | :--- | :--- | :--- |"]
+        for r in raced:
+            a = r["adaptive"]
+            report_content.append(f"| {label(r)} | {a['items']}/{a['total']} | {a['acc_ci'][0]*100:.1f}% .. {a['acc_ci'][1]*100:.1f}% | "
+                                  f"{a['lat_ci'][0]:.0f} .. {a['lat_ci'][1]:.0f}ms | {a['status']} |")
+
+    # Quant variants side by side per family: the smallest file that stays within --quant-tolerance of the best accuracy
+    families = {}
+    for r in summaries:
+        if r.get("draft"): continue
+        families.setdefault((r["dataset"], r.get("batch", 1), r.get("encoding", "json"), r.get("family", r["id"])), []).append(r)
+    families = {key: runs for key, runs in families.items() if len({r.get("quant") for r in runs}) > 1}
+    if families:
+        tolerance = args.quant_tolerance
+        report_content += ["", "## Quantization Variants", "", f"Pick: smallest file within {tolerance * 100:.1f} points of the family's best accuracy.", "",
+                           "| Family | Quant | File | Load | Peak RSS | Accuracy | vs Best | p50 | Gen tok/s | Items/s | Pick |",
+                           "| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |"]
+        for (dataset, batch, encoding, family), runs in families.items():
+            best = max(r["acc"] for r in runs)
+            size = lambda r: r.get("model_bytes") or r.get("rss_peak") or float("inf")
+            pick = min((r for r in runs if r["acc"] >= best - tolerance), key=size)
+            name = next((m["name"] for m in manifest["models"] if m["id"] == family), family) + (f" ({Path(dataset).stem})" if multi_dataset else "") \
+                + (f" K={batch}" if batched else "") + (f" {encoding}" if encoded else "")
+            for r in sorted(runs, key=size):
+                gb = lambda v: f"{v / 1024**3:.2f}GB" if v else "-"
+                report_content.append(f"| {name} | {r.get('quant') or '-'} | {gb(r.get('model_bytes'))} | {r['load_s'] or 0:.1f}s | {gb(r.get('rss_peak'))} | "
+                                      f"{r['acc']*100:.1f}% | {(r['acc'] - best) * 100:+.1f}pt | {r['p50']:.0f}ms | {r.get('gen_tps') or 0:.1f} | "
+                                      f"{r['throughput'] or 0:.2f} | {'yes' if r is pick else ''} |")
+
+    # Server resources sampled from /proc while each run inferred: what decides whether a model fits a host
+    sampled = [r for r in summaries if r.get("resources")]
+    if sampled:
+        report_content += ["", "## Resources", "", "| Model | Peak RSS | Mean RSS | CPU s | CPU s/item | Core Util (mean/max) | Minor/Major Faults | Ctx Switches (vol/invol) |",
+                           "| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |"]
+        for r in sampled:
+            res = r["resources"]
+            util = res.get("core_util") or [0]
+            cpu = f"{r['cpu_item']:.3f}" if r.get("cpu_item") else "-"
+            report_content.append(f"| {label(r)} | {res['rss_peak'] / 1024**3:.2f}GB | {res['rss_mean'] / 1024**3:.2f}GB | {res['cpu_s']:.1f} | {cpu} | "
+                                  f"{sum(util) / len(util) * 100:.0f}% / {max(util) * 100:.0f}% | {res['minflt']}/{res['majflt']} | {res['ctx_vol']}/{res['ctx_invol']} |")
+
+    # llama-server's own timings: no client overhead, and the KV reuse the server actually achieved
+    logged = [r for r in summaries if r.get("server")]
+    if logged:
+        report_content += ["", "## Server Timings", "", "| Model | Requests | Prompt Eval | Prompt tok/s | Eval | Eval tok/s | KV Prefix Reused | Slot Reuse | Requests per Slot |",
+                           "| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |"]
+        def pct(v): return f"{v*100:.0f}%" if v is not None else "-"
+        def num(v, fmt): return format(v, fmt) if v is not None else "-"
+        for r in logged:
+            m, server = r["server_metrics"], r["server"]
+            slots = " ".join(f"{slot}:{n}" for slot, n in m.get("slots", {}).items()) or "-"
+            report_content.append(f"| {label(r)} | {m['requests']} | {num(server['prompt_eval_ms'], '.0f')}ms | {num(server['prompt_tps'], '.0f')} | "
+                                  f"{num(server['eval_ms'], '.0f')}ms | {num(server['eval_tps'], '.1f')} | {pct(server['cache_hit'])} | {pct(server['slot_reuse'])} | {slots} |")
+
+    # Speculative decoding: each draft length against the same model, dataset, batch and encoding without a draft
+    speculative = [r for r in summaries if r.get("draft") and not r.get("config")]
+    if speculative:
+        report_content += ["", "## Speculative Decoding", "", "| Model | Draft Model | Draft | Acceptance | Accuracy | p50 | Gen tok/s | Items/s | Speedup |",
+                           "| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |"]
+        for r in speculative:
+            key = (r["id"], r["dataset"], r.get("batch", 1), r.get("encoding", "json"))
+            base = next((b for b in summaries if not b.get("draft") and not b.get("config")
+                         and (b["id"], b["dataset"], b.get("batch", 1), b.get("encoding", "json")) == key), None)
+            # Client-side acceptance needs timings in the response; fall back to the server log
+            accept = r.get("draft_accept") if r.get("draft_accept") is not None else (r.get("server") or {}).get("draft_accept")
+            speedup = f"{r['throughput'] / base['throughput']:.2f}x" if base and r["throughput"] and base["throughput"] else "-"
+            gen_speedup = f" ({r['gen_tps'] / base['gen_tps']:.2f}x)" if base and r.get("gen_tps") and base.get("gen_tps") else ""
+            acc_change = f" ({(r['acc'] - base['acc']) * 100:+.1f}pt)" if base else ""
+            accept = f"{accept*100:.0f}%" if accept is not None else "-"
+            report_content.append(f"| {label(r)} | {r.get('draft_model') or '-'} | {r['draft']} | {accept} | "
+                                  f"{r['acc']*100:.1f}%{acc_change} | {r['p50']:.0f}ms | "
+                                  f"{r.get('gen_tps') or 0:.1f}{gen_speedup} | {r['throughput'] or 0:.2f} | {speedup} |")
+
+    # Batching trades per-file latency for throughput; show both against the smallest K per model
+    if batched:
+        report_content += ["", "## Batch Size Trade-off", "", "| Model | Batch | Accuracy | Items/s | Speedup | Latency |", "| :--- | :--- | :--- | :--- | :--- | :--- |"]
+        for r in sorted(summaries, key=lambda x: (args.dataset.index(x["dataset"]), x["name"], x.get("batch", 1))):
+            base = min((b for b in summaries if (b["id"], b["dataset"], b.get("draft", 0)) == (r["id"], r["dataset"], r.get("draft", 0))), key=lambda b: b.get("batch", 1))
+            name = (f"{r['name']} ({Path(r['dataset']).stem})" if multi_dataset else r["name"]) + (f" draft{r['draft']}" if r.get("draft") else "")
+            speedup = f"{r['throughput'] / base['throughput']:.2f}x" if r["throughput"] and base["throughput"] else "-"
+            throughput = f"{r['throughput']:.2f}" if r["throughput"] else "-"
+            report_content.append(f"| {name} | {r.get('batch', 1)} | {r['acc']*100:.1f}% | {throughput} | {speedup} | {r['lat']:.0f}ms |")
+
+    # Server sweep: every configuration, with the p50 / throughput / RSS Pareto frontier marked
+    swept = [r for r in summaries if r.get("config")]
+    if swept:
+        front = pareto_front(swept)
+        drafted = any(r["config"].get("draft") for r in swept)
+        report_content += ["", "## Server Sweep", "", "| Threads | Batch | UBatch | Ctx/slot | Parallel | KV | FA | " + ("Draft (Accept) | " if drafted else "")
+                           + "Accuracy | p50 | p99 | Throughput | Peak RSS | Pareto |", "| :--- " * (14 if drafted else 13) + "|"]
+        for r in sorted(swept, key=lambda x: x["p50"]):
+            c = r["config"]
+            throughput = f"{r['throughput']:.2f}/s" if r["throughput"] else "-"
+            rss = f"{r['rss_peak'] / 1024**3:.2f}GB" if r.get("rss_peak") else "-"
+            accept = r.get("draft_accept") if r.get("draft_accept") is not None else (r.get("server") or {}).get("draft_accept")
+            draft = (f"{c['draft']}" + (f" ({accept*100:.0f}%)" if accept is not None else "") if c.get("draft") else "off") + " | " if drafted else ""
+            report_content.append(f"| {c['threads'] or 'auto'} | {c['batch'] or 'auto'} | {c['ubatch'] or 'auto'} | {c['ctx']} | {c['parallel']} | {c['kv']} | {c['flash_attn']} | {draft}"
+                                  f"{r['acc']*100:.1f}% | {r['p50']:.0f}ms | {r['p99']:.0f}ms | {throughput} | {rss} | {'yes' if r in front else ''} |")
+        report_content += ["", "Pareto-optimal llama-server flags:", ""]
+        report_content += [f"- `{r['flags']}`" for r in sorted(front, key=lambda x: x["p50"])]
+
+    # Output encodings: decode tokens saved vs accuracy, relative to verbose JSON where it was run
+    if encoded:
+        report_content += ["", "## Output Encodings", "", "| Model | Encoding | Accuracy | Gen tok/item | Decode | Items/s |", "| :--- | :--- | :--- | :--- | :--- | :--- |"]
+        for r in sorted(summaries, key=lambda x: (args.dataset.index(x["dataset"]), x["name"], x.get("batch", 1), ENCODINGS.index(x.get("encoding", "json")))):
+            name = label(r).replace(f" {r.get('encoding', 'json')}", "")
+            throughput = f"{r['throughput']:.2f}" if r["throughput"] else "-"
+            report_content.append(f"| {name} | {r.get('encoding', 'json')} | {r['acc']*100:.1f}% | {r.get('gen_tokens', 0):.1f} | {r['decode']:.0f}ms | {throughput} |")
+
+    # Cascade: heuristic pre-pass with LLM fallback, swept over confidence thresholds
+    cascaded = [r for r in summaries if r.get("cascade")]
+    if cascaded:
+        report_content += ["", "## Cascade", "",
+                           "Items/s is modeled, not measured: heuristic time plus each escalated item's LLM latency divided by the requests in flight.", "",
+                           "| Model | Threshold | Escalated | Accuracy | Items/s (modeled) |", "| :--- | :--- | :--- | :--- | :--- |"]
+        for r in cascaded:
+            c = r["cascade"]
+            name = f"{r['name']} ({Path(r['dataset']).stem})" if multi_dataset else r["name"]
+            report_content.append(f"| {name} | heuristic only | 0.0% | {c['heuristic_acc']*100:.1f}% | {c['heuristic_throughput'] or 0:.0f} |")
+            for row in c["rows"]:
+                report_content.append(f"| {name} | {row['threshold']:.2f} | {row['escalated']*100:.1f}% | {row['acc']*100:.1f}% | {row['projected_items_per_s'] or 0:.1f} |")
 
     # Save timestamped report
     ts = int(time.time())
@@ -272,10 +1122,317 @@ if __name__ == "__main__":
     with open(report_path, 'w') as f:
         f.write("\n".join(report_content))
 
+    # Per-item rows go to a JSONL sidecar so shard reports can be merged without re-running anything
+    items_path = report_path.with_suffix(".items.jsonl")
+    with open(items_path, 'w', encoding='utf-8') as f:
+        for r in summaries:
+            for item in r["items"]:
+                f.write(json.dumps({"id": r["id"], "dataset": r["dataset"], "batch": r.get("batch", 1), "encoding": r.get("encoding", "json"), "draft": r.get("draft", 0), **item}, ensure_ascii=False) + "\n")
+
+    # The same rows as CSV for spreadsheets and ad-hoc analysis
+    with open(report_path.with_suffix(".items.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for r in summaries:
+            for item in r["items"]:
+                writer.writerow({"id": r["id"], "dataset": r["dataset"], "batch": r.get("batch", 1), "encoding": r.get("encoding", "json"), "draft": r.get("draft", 0),
+                                 **item, "cached": bool(item.get("cached")), "tags": ";".join(item.get("tags") or [])})
+
+    # JSON twin of the Markdown summary (latest.json is what `--compare` picks up by default)
+    report_json = {
+        "date": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "dataset": args.dataset,
+        "limit": args.limit,
+        "offset": args.offset,
+        "shard": list(args.shard),
+        "hardware": bench.hw,
+        "items_file": items_path.name,
+        "models": [{k: v for k, v in r.items() if k != "items"} for r in summaries]
+    }
+    for path in (report_path.with_suffix(".json"), bench.reports_dir / "latest.json"):
+        with open(path, 'w') as f: json.dump(report_json, f, indent=2)
+
     # Save as 'latest.md' for README sync
     with open(bench.reports_dir / "latest.md", 'w') as f:
         f.write("\n".join(report_content))
 
     print(f"\n--- Final Results ---\n")
     print("\n".join(report_content[5:]))
+    if args.harness_only:
+        for r in summaries:
+            print(f"\nHarness ceiling ({Path(r['dataset']).stem}): {r['throughput'] or 0:.1f} items/s, {r['lat']:.2f}ms per item")
     print(f"\nReports saved to: {report_path} and shirariumbench/reports/latest.md")
+
+def merge_reports(bench: ShirariumBench, paths: List[str]) -> List[Dict[str, Any]]:
+    """Combine shard reports (JSON + items sidecar) into one summary per model/dataset."""
+    groups = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f: report = json.load(f)
+        for m in report["models"]:
+            group = groups.setdefault((m["id"], m["dataset"], m.get("batch", 1), m.get("encoding", "json"), m.get("draft", 0)), {
+                "id": m["id"], "name": m["name"], "dataset": m["dataset"], "batch": m.get("batch", 1), "encoding": m.get("encoding", "json"), "load_s": m["load_s"],
+                "family": m.get("family", m["id"]), "quant": m.get("quant"), "model_bytes": m.get("model_bytes"),
+                "draft": m.get("draft", 0), "draft_model": m.get("draft_model"), "throughput": 0.0, "cached": 0, "infer_s": 0.0, "items": {}, "resources": [], "server_metrics": []
+            })
+            # Shards run side by side, so their rates add up while wall time is the longest shard
+            group["throughput"] += m["throughput"] or 0
+            group["cached"] += m["cached"]
+            group["infer_s"] = max(group["infer_s"], m["infer_s"])
+            group["resources"].append(m.get("resources"))
+            group["server_metrics"].append(m.get("server_metrics"))
+        with open(Path(path).parent / report["items_file"], 'r', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                groups[(row.pop("id"), row.pop("dataset"), row.pop("batch", 1), row.pop("encoding", "json"), row.pop("draft", 0))]["items"][row["index"]] = row
+
+    summaries = []
+    for group in groups.values():
+        items = [group["items"][idx] for idx in sorted(group["items"])]
+        summary = bench.summarize(items, len(items) - group["cached"], group["infer_s"])
+        summary["throughput"] = group["throughput"] or None
+        resources = merge_resources(group["resources"])
+        if resources:
+            fresh = len(items) - group["cached"]
+            summary.update(resources=resources, rss_peak=resources["rss_peak"], cpu_item=resources["cpu_s"] / fresh if fresh else None)
+        server_metrics = merge_metrics(group["server_metrics"])
+        if server_metrics:
+            summary.update(server_metrics=server_metrics, server=rates(server_metrics))
+        summaries.append({"id": group["id"], "name": group["name"], "dataset": group["dataset"], "batch": group["batch"], "encoding": group["encoding"],
+                          "family": group["family"], "quant": group["quant"], "model_bytes": group["model_bytes"],
+                          "draft": group["draft"], "draft_model": group["draft_model"], "load_s": group["load_s"], **summary})
+    return summaries
+
+def load_report(path: str) -> Dict[tuple, Dict[str, Any]]:
+    """A JSON report and its items sidecar, keyed like merge_reports: (id, dataset, batch, encoding, draft)."""
+    with open(path, 'r', encoding='utf-8') as f: report = json.load(f)
+    runs = {(m["id"], m["dataset"], m.get("batch", 1), m.get("encoding", "json"), m.get("draft", 0)): {**m, "items": []} for m in report["models"]}
+    with open(Path(path).parent / report["items_file"], 'r', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            key = (row.pop("id"), row.pop("dataset"), row.pop("batch", 1), row.pop("encoding", "json"), row.pop("draft", 0))
+            if key in runs: runs[key]["items"].append(row)
+    return runs
+
+def compare_reports(baseline_path: str, candidate_path: str, args) -> bool:
+    """Print candidate vs baseline with bootstrap intervals; return True when any change is a significant regression."""
+    baseline, candidate = load_report(baseline_path), load_report(candidate_path)
+    shared = [key for key in candidate if key in baseline]
+    if not shared:
+        print("No model/dataset runs in common between the two reports")
+        return False
+    pct = f"{args.confidence * 100:.0f}%"
+    lines = [f"# Comparison: `{candidate_path}` vs baseline `{baseline_path}`", "",
+             f"Bootstrap: {args.bootstrap} resamples, {pct} intervals. Regression when the whole interval is worse than "
+             f"{args.tolerance * 100:.1f}% (latency/throughput) or {args.acc_tolerance * 100:.1f} points (accuracy).", "",
+             f"| Model | Metric | Baseline | Candidate | Change | {pct} CI | Verdict |", "| :--- | :--- | :--- | :--- | :--- | :--- | :--- |"]
+    regressed = False
+    for key in shared:
+        base_run, cand_run = baseline[key], candidate[key]
+        base_items = {i["index"]: i for i in base_run["items"]}
+        cand_items = {i["index"]: i for i in cand_run["items"]}
+        # Same items on both sides: pair them so item difficulty cancels out; otherwise compare the two samples as they are
+        common = sorted(base_items.keys() & cand_items.keys())
+        if common:
+            base_rows, cand_rows = [base_items[i] for i in common], [cand_items[i] for i in common]
+        else:
+            base_rows, cand_rows = base_run["items"], cand_run["items"]
+        # Replayed latencies from the result store say nothing about this build
+        timed = [(b, c) for b, c in zip(base_rows, cand_rows) if not b.get("cached") and not c.get("cached")] if common else []
+        base_lat = [b["lat"] for b, _ in timed] if common else [r["lat"] for r in base_rows if not r.get("cached")]
+        cand_lat = [c["lat"] for _, c in timed] if common else [r["lat"] for r in cand_rows if not r.get("cached")]
+        name = base_run["name"] + (f" ({Path(key[1]).stem})" if len({k[1] for k in shared}) > 1 else "") \
+            + (f" K={key[2]}" if key[2] != 1 else "") + (f" {key[3]}" if key[3] != "json" else "") + (f" draft{key[4]}" if key[4] else "")
+
+        def row(metric, base_value, cand_value, change, low, high, worse_when, unit, relative=True):
+            nonlocal regressed
+            limit = args.tolerance if relative else args.acc_tolerance
+            if worse_when == "up": verdict = "REGRESSION" if low > limit else "improved" if high < -limit else "no change"
+            else: verdict = "REGRESSION" if high < -limit else "improved" if low > limit else "no change"
+            regressed |= verdict == "REGRESSION"
+            fmt = (lambda v: f"{v * 100:+.1f}%") if relative else (lambda v: f"{v * 100:+.1f}pt")
+            lines.append(f"| {name} | {metric} | {base_value}{unit} | {cand_value}{unit} | {fmt(change)} | {fmt(low)} .. {fmt(high)} | {verdict} |")
+
+        def boot(b, c, stat, relative=True):
+            # Only the branch that aligned items by dataset index may resample them as pairs
+            return bootstrap(b, c, stat, relative, args.bootstrap, args.confidence, paired=bool(common))
+
+        if len(base_lat) >= 2 and len(cand_lat) >= 2:
+            for stat in ("p50", "p99"):
+                row(f"{stat} latency", f"{percentile(base_lat, int(stat[1:])):.0f}", f"{percentile(cand_lat, int(stat[1:])):.0f}", *boot(base_lat, cand_lat, stat), "up", "ms")
+            # Throughput is one number per run; its interval comes from the spread of mean latency at fixed concurrency
+            if base_run.get("throughput") and cand_run.get("throughput"):
+                lat_change, lat_low, lat_high = boot(base_lat, cand_lat, "mean")
+                change = cand_run["throughput"] / base_run["throughput"] - 1
+                scale = lambda r: (1 + change) * (1 + lat_change) / (1 + r) - 1
+                row("throughput", f"{base_run['throughput']:.2f}", f"{cand_run['throughput']:.2f}", change, scale(lat_high), scale(lat_low), "down", "/s")
+        else:
+            lines.append(f"| {name} | latency | - | - | - | - | skipped (fewer than 2 freshly timed items) |")
+        base_acc, cand_acc = [r["acc"] for r in base_rows], [r["acc"] for r in cand_rows]
+        row("accuracy", f"{mean(base_acc) * 100:.1f}", f"{mean(cand_acc) * 100:.1f}", *boot(base_acc, cand_acc, "mean", relative=False), "down", "%", relative=False)
+
+    for key in baseline.keys() - candidate.keys():
+        lines.append(f"| {baseline[key]['name']} | - | - | - | - | - | missing from candidate |")
+    print("\n".join(lines))
+    print("\nResult: " + ("significant regression" if regressed else "no significant regression"))
+    return regressed
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", nargs="+", default=["datasets/regression/tier-a-golden.json"],
+                        help="One or more datasets; each model's server is reused across all of them")
+    parser.add_argument("--limit", type=int, default=0, help="Limit items per model")
+    parser.add_argument("--offset", type=int, default=0, help="Skip this many dataset items before --limit applies")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), metavar="I/N",
+                        help="Evaluate every N-th item of the window starting at I (0-based), for splitting a corpus across processes")
+    parser.add_argument("--merge", nargs="+", metavar="REPORT", help="Merge shard JSON reports into one report instead of benchmarking")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT",
+                        help="BASELINE [CANDIDATE]: compare two JSON reports (candidate defaults to reports/latest.json); exits 1 on a significant regression")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Relative latency/throughput change --compare tolerates (default 0.05)")
+    parser.add_argument("--acc-tolerance", type=float, default=0.005, help="Absolute accuracy drop --compare tolerates (default 0.005)")
+    parser.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap resamples for --compare intervals")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of --compare intervals")
+    parser.add_argument("--model", help="Specific model ID (default: all)")
+    parser.add_argument("--ngl", type=int, default=99, help="Number of GPU layers")
+    parser.add_argument("--output", help="Specific output filename")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests kept in flight per model")
+    parser.add_argument("--parallel", type=int, default=0, help="llama-server slots (default: --concurrency)")
+    parser.add_argument("--no-prompt-cache", action="store_true", help="Disable prompt-prefix KV reuse and slot pinning")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the on-disk result store and re-run every item")
+    parser.add_argument("--rescore", action="store_true", help="Recompute scores from cached outputs only (no inference)")
+    parser.add_argument("--stream", action="store_true", help="Stream responses (SSE) to measure TTFT and decode tokens/sec")
+    parser.add_argument("--slowest", type=int, default=5, help="Number of slowest items listed per model")
+    parser.add_argument("--instances", type=int, default=1, help="Benchmark this many models at once, each on its own port and core set")
+    parser.add_argument("--attach", help="Benchmark an already-running llama-server at this URL instead of launching one")
+    parser.add_argument("--fake-server", metavar="LATENCY",
+                        help="Answer from a built-in fake llama-server with canned outputs, e.g. const:0, uniform:20:80, normal:50:10, lognormal:40:0.5 (ms)")
+    parser.add_argument("--harness-only", action="store_true", help="Measure the runner's own throughput ceiling (fake server, zero latency, no result store)")
+    parser.add_argument("--batch", nargs="+", type=int, default=[1], metavar="K",
+                        help="Filenames per request; several values sweep the accuracy vs items/sec trade-off")
+    parser.add_argument("--encoding", nargs="+", choices=ENCODINGS, default=["json"],
+                        help="Output encoding: verbose JSON, short-key JSON, positional array or a pipe-delimited GBNF line; several values compare them")
+    parser.add_argument("--cascade", nargs="*", type=float, metavar="THRESHOLD",
+                        help="Heuristic pre-pass; only items below a confidence threshold go to the LLM (default sweep: 0.55 0.65 0.75 0.9)")
+    parser.add_argument("--sweep", nargs="+", metavar="AXIS=V1,V2",
+                        help="Benchmark one model over a grid of server settings: threads (numbers, cores, logical), batch, ubatch, ctx (per slot), parallel, kv, flash_attn")
+    parser.add_argument("--quants", nargs="*", metavar="QUANT",
+                        help="Also run each family's quant variants from models.json (all of them, or only those listed, e.g. Q4_K_M Q8_0)")
+    parser.add_argument("--quant-tolerance", type=float, default=0.01, help="Accuracy a smaller quant may lose and still be recommended")
+    parser.add_argument("--speculative", nargs="+", type=int, metavar="DRAFT",
+                        help="Also run models that declare a draft model with speculative decoding at these draft lengths (tokens per step)")
+    parser.add_argument("--adaptive", type=int, nargs="?", const=100, metavar="ITEMS",
+                        help="Sample each model in rounds of ~ITEMS items (default 100): a pilot round for every model, then the rest best-first, stopping models that are clearly beaten")
+    parser.add_argument("--adaptive-min", type=int, default=100, help="Items a model needs before --adaptive may stop it")
+    parser.add_argument("--adaptive-confidence", type=float, default=0.99, help="Confidence of the --adaptive intervals (high, since they are checked every round)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between /proc samples of the llama-server (memory, CPU, faults)")
+    parser.add_argument("--model-cache", help="Shared model cache directory (default: $SHIRARIUM_MODEL_CACHE or ~/.cache/shirarium/models)")
+    parser.add_argument("--download-parts", type=int, default=4, help="Parallel byte-range connections per model download")
+    parser.add_argument("--pin-digests", action="store_true",
+                        help="Write the SHA-256 of every models.json file (models, variants, drafts) that has none, then exit")
+    parser.add_argument("--ram-budget", type=float, default=0, help="RAM (GB) shared by concurrent instances (default: 90%% of available)")
+    args = parser.parse_args()
+    if args.cascade == []: args.cascade = [0.55, 0.65, 0.75, 0.9]
+
+    if args.compare:
+        if len(args.compare) > 2: parser.error("--compare takes BASELINE [CANDIDATE]")
+        candidate = args.compare[1] if len(args.compare) > 1 else "shirariumbench/reports/latest.json"
+        sys.exit(1 if compare_reports(args.compare[0], candidate, args) else 0)
+    with open("shirariumbench/models.json", 'r') as f: manifest = json.load(f)
+    if args.pin_digests:
+        sys.exit(0 if pin_digests(manifest, ModelDownloader(args.model_cache, args.download_parts)) else 1)
+    if args.merge:
+        bench = ShirariumBench()
+        bench.slowest = args.slowest
+        summaries = merge_reports(bench, args.merge)
+        args.dataset = list(dict.fromkeys(r["dataset"] for r in summaries))
+        args.batch = sorted({r["batch"] for r in summaries})
+        args.encoding = [e for e in ENCODINGS if any(r["encoding"] == e for r in summaries)]
+        write_report(bench, summaries, manifest, args)
+        sys.exit(0)
+    if args.sweep:
+        if args.attach or args.fake_server or args.harness_only or args.instances > 1:
+            parser.error("--sweep launches its own llama-server per configuration; drop --attach/--fake-server/--harness-only/--instances")
+        # Every configuration must actually run inference to be measured
+        args.no_cache = True
+    if args.speculative or (args.sweep and any(s.startswith("draft=") for s in args.sweep)):
+        if args.attach or args.fake_server or args.harness_only:
+            parser.error("speculative decoding is a llama-server launch setting; drop --attach/--fake-server/--harness-only")
+    if args.adaptive:
+        if args.speculative or args.sweep or args.attach or args.fake_server or args.harness_only or args.instances > 1 or args.cascade or args.shard[1] > 1:
+            parser.error("--adaptive races the models from models.json itself; drop --speculative/--sweep/--attach/--fake-server/--harness-only/--instances/--cascade/--shard")
+    if args.harness_only:
+        # Cached outputs would skip the very code paths being measured
+        args.fake_server, args.no_cache = args.fake_server or "const:0", True
+    fake = None
+    if args.fake_server:
+        if args.attach or args.instances > 1:
+            parser.error("--fake-server replaces the llama-server; drop --attach/--instances")
+        fake = FakeLlamaServer(8090, canned_outputs(args.dataset), args.fake_server, args.parallel or args.concurrency).start()
+        args.attach = fake.url
+    if args.rescore and args.no_cache:
+        parser.error("--rescore needs the result store; drop --no-cache")
+    store = None if args.no_cache else ResultStore(Path("shirariumbench/results.sqlite3"))
+
+    downloader = None if args.attach else ModelDownloader(args.model_cache, args.download_parts)
+
+    def make_bench(port: int) -> ShirariumBench:
+        bench = ShirariumBench(port)
+        bench.downloader = downloader
+        bench.sample_interval = args.sample_interval
+        bench.prompt_cache = not args.no_prompt_cache
+        bench.stream = args.stream
+        bench.slowest = args.slowest
+        bench.store = store
+        bench.progress = args.instances <= 1
+        bench.cascade = sorted(args.cascade or [])
+        return bench
+
+    if args.attach and args.instances > 1:
+        parser.error("--attach targets a single server; drop --instances")
+
+    bench = make_bench(8080)
+    # --model picks a family (or one `<id>@<quant>` variant); --quants widens each family to its declared variants
+    catalog = [v for m in manifest["models"] for v in model_variants(m)]
+    wanted = None if args.quants is None else {q.lower() for q in args.quants}
+    models = [v for v in catalog if v["id"] == args.model or ((not args.model or v["family"] == args.model)
+              and (v["id"] == v["family"] if wanted is None else not wanted or v["quant"].lower() in wanted))]
+    if args.attach:
+        bench.attach(args.attach)
+        # --model only labels the attached server; without it, report under the name the server gives
+        models = models[:1] if args.model else [{"id": "attached", "name": bench.served_model, "filename": ""}]
+
+    grid = []
+    if args.sweep:
+        try: grid = parse_sweep(args.sweep, bench.hw)
+        except ValueError as e: parser.error(str(e))
+        if len(models) > 1: print(f"Sweep uses a single model: {models[0]['name']} (pick another with --model)")
+        models = models[:1]
+
+    print(f"--- ShirariumBench Automation ---")
+    print(f"Dataset: {', '.join(args.dataset)} (Limit: {args.limit if args.limit > 0 else 'All'})")
+    print(f"Hardware: {bench.hw['cpu']} ({bench.hw['cores']} cores / {bench.hw['usable_threads']} threads) | {bench.hw['gpu']}")
+    print(f"Models to test: {len(models)}")
+
+    summaries = []
+    if grid:
+        print(f"Sweep: {len(grid)} server configurations")
+        summaries = run_sweep(bench, models[0], args, grid)
+    elif args.adaptive:
+        summaries = run_adaptive(bench, models, args)
+    elif args.instances > 1:
+        ram_budget = int(args.ram_budget * 1024**3) if args.ram_budget else int((available_memory() or 0) * 0.9)
+        benches = [bench] + [make_bench(8080 + i) for i in range(1, args.instances)]
+        print(f"Instances: {args.instances} (ports 8080-{8079 + args.instances}, RAM budget: {ram_budget / 1024**3:.1f}GB)")
+        summaries = run_instances(benches, models, args, ram_budget)
+    else:
+        for i, m in enumerate(models):
+            # Download model N+1 in the background while model N is benchmarked
+            if i + 1 < len(models) and not (args.rescore or args.attach):
+                bench.prefetch_model(models[i + 1])
+            try:
+                summaries.extend(benchmark_model(bench, m, args))
+            except Exception as e:
+                print(f"\n!! Failed {m['name']}: {e}")
+    if fake: fake.stop()
+
+    write_report(bench, summaries, manifest, args)
@@ -0,0 +1,107 @@
+import threading
+from array import array
+from typing import Dict, Any, List, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # pure-Python fallback; same results, just slower on large rescoring runs
+
+FIELDS = ["Title", "Year", "Season", "Episode", "Resolution"]
+LOWER_FIELDS = [f.lower() for f in FIELDS]  # dataset expectations use lowercase keys
+POPCOUNT = [bin(m).count("1") for m in range(1 << len(FIELDS))]  # matched fields per bitmask
+
+def normalize(value: Any) -> str:
+    # Missing, null, empty and 0 all compare as "" (matches the original per-item scorer)
+    return str(value or "").lower().strip()
+
+class Vocabulary:
+    """Interns normalised field values to integer codes, shared by every table so codes compare across models."""
+
+    def __init__(self):
+        self.codes = {"": 0}
+        # Raw values seen before skip normalisation; keyed with the type so 1, 1.0 and True stay distinct
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def code(self, value: Any) -> int:
+        raw = (type(value), value)
+        try:
+            return self.seen[raw]
+        except KeyError:
+            cacheable = True
+        except TypeError:
+            cacheable = False  # unhashable output (a list or dict): normalise it every time
+        with self.lock:
+            code = self.codes.setdefault(normalize(value), len(self.codes))
+            if cacheable: self.seen[raw] = code
+        return code
+
+    def encode(self, values: List[Any]) -> List[int]:
+        """Codes for a whole column; values seen before are resolved in one pass with no per-value calls."""
+        seen = self.seen
+        try:
+            codes = [seen.get((type(v), v)) for v in values]
+        except TypeError:
+            codes = [None] * len(values)
+        if None in codes:
+            codes = [self.code(v) if c is None else c for v, c in zip(values, codes)]
+        return codes
+
+class ScoreTable:
+    """Expected and actual values for one run, stored as one integer column per field and scored in a single pass."""
+
+    def __init__(self, vocab: Vocabulary):
+        self.vocab = vocab
+        self.expected = [array("i") for _ in FIELDS]
+        self.actual = [array("i") for _ in FIELDS]
+
+    def __len__(self) -> int:
+        return len(self.expected[0])
+
+    def add(self, expected: List[Dict[str, Any]], actual: List[Dict[str, Any]]):
+        """Append rows, one field column at a time."""
+        encode = self.vocab.encode
+        for f, low, exp_col, act_col in zip(FIELDS, LOWER_FIELDS, self.expected, self.actual):
+            exp_col.extend(encode([e.get(f) or e.get(low) for e in expected]))
+            act_col.extend(encode([a.get(f) or a.get(low) for a in actual]))
+
+    def score(self) -> tuple:
+        """Return (field bitmask, accuracy) per row; bit i is set when FIELDS[i] matched."""
+        if np is not None:
+            masks = np.zeros(len(self), dtype=np.int32)
+            hits = np.zeros(len(self), dtype=np.int32)
+            for bit, (exp_col, act_col) in enumerate(zip(self.expected, self.actual)):
+                match = (np.frombuffer(exp_col, dtype=np.int32) == np.frombuffer(act_col, dtype=np.int32)).astype(np.int32)
+                masks |= match << bit
+                hits += match
+            return masks.tolist(), (hits / len(FIELDS)).tolist()
+        masks = [0] * len(self)
+        for bit, (exp_col, act_col) in enumerate(zip(self.expected, self.actual)):
+            flag = 1 << bit
+            masks = [m | flag if e == a else m for m, e, a in zip(masks, exp_col, act_col)]
+        return masks, [POPCOUNT[m] / len(FIELDS) for m in masks]
+
+def breakdown(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Per-field and per-tag accuracy from scored rows (each with a "fields" bitmask and optional "tags")."""
+    masks, by_tag = [], {}
+    for pos, row in enumerate(r for r in rows if "fields" in r):
+        masks.append(row["fields"])
+        for tag in row.get("tags") or ():
+            by_tag.setdefault(tag, []).append(pos)
+    if not masks: return {"fields": {}, "tags": {}}
+
+    if np is not None:
+        m = np.asarray(masks, dtype=np.int32)
+        acc = np.asarray(POPCOUNT, dtype=np.float64)[m] / len(FIELDS)
+        fields = {f: float(((m >> bit) & 1).mean()) for bit, f in enumerate(FIELDS)}
+        tags = {tag: float(acc[idx].mean()) for tag, idx in by_tag.items()}
+    else:
+        fields = {f: sum((mask >> bit) & 1 for mask in masks) / len(masks) for bit, f in enumerate(FIELDS)}
+        tags = {tag: sum(POPCOUNT[masks[i]] for i in idx) / len(FIELDS) / len(idx) for tag, idx in by_tag.items()}
+    return {"fields": fields, "tags": dict(sorted(tags.items()))}
+
+def score_pair(expected: Dict[str, Any], actual: Dict[str, Any]) -> float:
+    """Accuracy of a single output (for one-off checks; runs use ScoreTable)."""
+    return sum(normalize(expected.get(f) or expected.get(f.lower())) == normalize(actual.get(f) or actual.get(f.lower()))
+               for f in FIELDS) / len(FIELDS)
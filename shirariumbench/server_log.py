@@ -0,0 +1,107 @@
+import re
+import threading
+from collections import deque
+from typing import Dict, Any, List
+
+LOG_LINES = 500  # raw lines kept for error tails; everything else is reduced to counters
+
+# llama-server slot log lines (tools/server/server.cpp); older builds say "kv cache rm" and "lcs"
+TIMING_RE = re.compile(r"\b(prompt eval|eval) time =\s*([\d.]+) ms /\s*(\d+) tokens")
+SLOT_RE = re.compile(r"\bid\s+(\d+) \| task (-?\d+) \|")
+NEW_PROMPT_RE = re.compile(r"new prompt, .*n_prompt_tokens = (\d+)")
+REUSED_RE = re.compile(r"(?:kv cache rm|memory_seq_rm) \[(\d+), end\)")
+SELECTED_RE = re.compile(r"selected slot by (lcs|lcp|lru)", re.IGNORECASE)
+DRAFT_RE = re.compile(r"draft acceptance rate = [\d.]+ \(\s*(\d+) accepted /\s*(\d+) generated\)")
+
+COUNTERS = ("requests", "prompt_ms", "prompt_tokens", "eval_ms", "eval_tokens", "new_prompts", "prompt_total",
+            "reused_tokens", "select_similarity", "select_lru", "draft_accepted", "draft_generated")
+
+class ServerLog:
+    """Bounded capture of llama-server output with its timing and slot lines folded into counters as they arrive."""
+
+    def __init__(self, max_lines: int = LOG_LINES):
+        self.lines = deque(maxlen=max_lines)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new measurement window (raw lines are kept for error reporting)."""
+        with self.lock:
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.slots = {}
+            self.timing_slot = None
+
+    def feed(self, line: str):
+        line = line.rstrip()
+        with self.lock:
+            self.lines.append(line)
+            c = self.counters
+            # Newer builds print the draft rate on its own line under a second print_timing header
+            match = DRAFT_RE.search(line)
+            if match:
+                c["draft_accepted"] += int(match.group(1))
+                c["draft_generated"] += int(match.group(2))
+                return
+            slot = SLOT_RE.search(line)
+            # print_timing logs a header line, then the timings (same line on older builds, following lines on newer)
+            if slot and "print_timing" in line: self.timing_slot = slot.group(1)
+            timing = TIMING_RE.search(line)
+            if timing:
+                kind, ms, tokens = timing.group(1), float(timing.group(2)), int(timing.group(3))
+                if kind == "prompt eval":
+                    c["requests"] += 1
+                    c["prompt_ms"] += ms
+                    c["prompt_tokens"] += tokens
+                    # One request per prompt eval line, so a second header for the draft rate isn't counted again
+                    if self.timing_slot is not None:
+                        self.slots[self.timing_slot] = self.slots.get(self.timing_slot, 0) + 1
+                        self.timing_slot = None
+                else:
+                    c["eval_ms"] += ms
+                    c["eval_tokens"] += tokens
+                return
+            if not slot: return
+            match = NEW_PROMPT_RE.search(line)
+            if match:
+                c["new_prompts"] += 1
+                c["prompt_total"] += int(match.group(1))
+                return
+            match = REUSED_RE.search(line)
+            if match:
+                c["reused_tokens"] += int(match.group(1))
+                return
+            match = SELECTED_RE.search(line)
+            if match:
+                c["select_lru" if match.group(1).lower() == "lru" else "select_similarity"] += 1
+
+    def tail(self, n: int) -> List[str]:
+        with self.lock:
+            return list(self.lines)[-n:]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters for the current window plus per-slot request counts; empty if the server logged no timings."""
+        with self.lock:
+            if not self.counters["requests"] and not self.counters["new_prompts"]: return {}
+            return {**self.counters, "slots": dict(sorted(self.slots.items(), key=lambda kv: int(kv[0])))}
+
+def rates(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Derived server-side figures: prompt/eval tokens per second, cached prefix share, slot reuse and draft acceptance."""
+    selected = metrics["select_similarity"] + metrics["select_lru"]
+    return {
+        "prompt_tps": metrics["prompt_tokens"] / metrics["prompt_ms"] * 1000 if metrics["prompt_ms"] else None,
+        "eval_tps": metrics["eval_tokens"] / metrics["eval_ms"] * 1000 if metrics["eval_ms"] else None,
+        "prompt_eval_ms": metrics["prompt_ms"] / metrics["requests"] if metrics["requests"] else None,
+        "eval_ms": metrics["eval_ms"] / metrics["requests"] if metrics["requests"] else None,
+        # Share of submitted prompt tokens the slot already held in its KV cache
+        "cache_hit": metrics["reused_tokens"] / metrics["prompt_total"] if metrics["prompt_total"] else None,
+        "slot_reuse": metrics["select_similarity"] / selected if selected else None,
+        "draft_accept": metrics.get("draft_accepted", 0) / metrics["draft_generated"] if metrics.get("draft_generated") else None
+    }
+
+def merge_metrics(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    parts = [p for p in parts if p]
+    if not parts: return {}
+    slots = {}
+    for p in parts:
+        for slot, n in p.get("slots", {}).items(): slots[slot] = slots.get(slot, 0) + n
+    return {**{k: sum(p.get(k, 0) for p in parts) for k in COUNTERS}, "slots": slots}
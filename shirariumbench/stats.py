@@ -0,0 +1,67 @@
+import random
+from statistics import NormalDist
+from typing import List, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # pure-Python resampling: same method, different random draws, slower
+
+def percentile(values: List[float], pct: float) -> float:
+    # Linear interpolation between closest ranks (same as numpy's default)
+    if not values: return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def mean(values: Sequence[float]) -> float:
+    return sum(values) / len(values) if len(values) else 0.0
+
+# Statistics bootstrap() understands by name, so the numpy path can vectorise them
+STATS = {
+    "mean": (mean, lambda a: float(a.mean())),
+    "p50": (lambda v: percentile(v, 50), lambda a: float(np.percentile(a, 50))),
+    "p99": (lambda v: percentile(v, 99), lambda a: float(np.percentile(a, 99))),
+}
+
+def bootstrap(baseline: List[float], candidate: List[float], stat: str, relative: bool = True,
+              iterations: int = 2000, confidence: float = 0.95, seed: int = 42, paired: bool = False) -> tuple:
+    """Change in `stat` from baseline to candidate with a percentile bootstrap interval: (change, low, high).
+
+    Relative changes are candidate/baseline - 1, absolute ones candidate - baseline. With `paired` the inputs
+    must be the same items in the same order and are resampled together, which removes item difficulty from
+    the noise; otherwise each side is resampled on its own.
+    """
+    python_stat, numpy_stat = STATS[stat]
+    def change(b, c):
+        if relative: return c / b - 1 if b else 0.0
+        return c - b
+    point = change(python_stat(baseline), python_stat(candidate))
+    if paired and len(baseline) != len(candidate): raise ValueError("paired samples must have the same length")
+    rng = random.Random(seed)
+    changes = []
+    if np is not None:
+        b_arr, c_arr = np.asarray(baseline, dtype=np.float64), np.asarray(candidate, dtype=np.float64)
+        gen = np.random.default_rng(seed)
+        for _ in range(iterations):
+            b_idx = gen.integers(0, len(b_arr), len(b_arr))
+            c_idx = b_idx if paired else gen.integers(0, len(c_arr), len(c_arr))
+            changes.append(change(numpy_stat(b_arr[b_idx]), numpy_stat(c_arr[c_idx])))
+    else:
+        for _ in range(iterations):
+            b_idx = rng.choices(range(len(baseline)), k=len(baseline))
+            c_idx = b_idx if paired else rng.choices(range(len(candidate)), k=len(candidate))
+            changes.append(change(python_stat([baseline[i] for i in b_idx]), python_stat([candidate[i] for i in c_idx])))
+    tail = (1 - confidence) / 2 * 100
+    return point, percentile(changes, tail), percentile(changes, 100 - tail)
+
+def mean_ci(values: Sequence[float], confidence: float = 0.95) -> tuple:
+    """Mean with a normal-approximation interval: (mean, low, high); the interval is infinite below two values."""
+    n = len(values)
+    m = mean(values)
+    if n < 2: return m, float("-inf"), float("inf")
+    sd = (sum((v - m) ** 2 for v in values) / (n - 1)) ** 0.5
+    half = NormalDist().inv_cdf(0.5 + confidence / 2) * sd / n ** 0.5
+    return m, m - half, m + half
@@ -0,0 +1,138 @@
+import hashlib
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import downloader
+from downloader import ModelDownloader
+
+BLOB = random.Random(7).randbytes(10 * downloader.CHUNK + 12345)  # about 2.5 CHUNKs for each of 4 ranged parts
+DIGEST = hashlib.sha256(BLOB).hexdigest()
+
+class StandIn(ThreadingHTTPServer):
+    """Hugging Face stand-in serving BLOB with optional byte ranges, truncated responses and corruption."""
+    daemon_threads = True
+
+    def __init__(self, ranges=True):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.ranges = ranges
+        self.cut_after = None  # stop each ranged body after this many bytes (simulates a dropped connection)
+        self.corrupt = False
+        self.requests = []
+
+    def url(self, name="model.gguf"):
+        return f"http://127.0.0.1:{self.server_port}/{name}"
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(302)
+        self.send_header("Location", "/blob")
+        self.send_header("X-Linked-Etag", f'"{DIGEST}"')
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        data = bytearray(BLOB)
+        if server.corrupt: data[len(data) // 2] ^= 0xFF
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range") or "")
+        server.requests.append(self.headers.get("Range"))
+        if match and server.ranges:
+            start, end = int(match.group(1)), int(match.group(2))
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if match and server.cut_after is not None and len(body) > 1:
+            self.wfile.write(body[:server.cut_after])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+class DownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache, True)
+
+    def start(self, **kwargs):
+        server = StandIn(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def fetch(self, server, sha256=None, parts=4):
+        info = {"name": "Stand-in", "url": server.url(), "sha256": sha256}
+        return ModelDownloader(self.cache, parts).fetch(info, self.cache / "model.gguf", quiet=True)
+
+    def test_ranged_download(self):
+        server = self.start()
+        target = self.fetch(server, DIGEST)
+        self.assertEqual(target.read_bytes(), BLOB)
+        ranges = [r for r in server.requests if r and r != "bytes=0-0"]
+        self.assertEqual(len(ranges), 4)
+        self.assertTrue((self.cache / "blobs" / "sha256" / DIGEST).exists())
+
+    def test_server_without_ranges(self):
+        server = self.start(ranges=False)
+        self.assertEqual(self.fetch(server).read_bytes(), BLOB)
+
+    def test_resume_after_dropped_connections(self):
+        server = self.start()
+        server.cut_after = 3 * downloader.CHUNK // 2
+        with self.assertRaises(Exception):
+            self.fetch(server, DIGEST)
+        server.cut_after = None
+        server.requests.clear()
+        self.assertEqual(self.fetch(server, DIGEST).read_bytes(), BLOB)
+        # Every part picks up after the bytes it already wrote instead of starting over
+        starts = sorted(int(r[6:].split("-")[0]) for r in server.requests if r and r != "bytes=0-0")
+        bounds = [i * len(BLOB) // 4 for i in range(4)]
+        self.assertEqual(len(starts), 4)
+        self.assertTrue(all(start > bound for start, bound in zip(starts, bounds)))
+
+    def test_corrupted_download_is_discarded(self):
+        server = self.start()
+        server.corrupt = True
+        with self.assertRaisesRegex(Exception, "SHA-256 mismatch"):
+            self.fetch(server, DIGEST)
+        self.assertFalse(any((self.cache / "blobs" / "sha256").iterdir()))
+        self.assertFalse(any((self.cache / "partial").iterdir()))
+        server.corrupt = False
+        self.assertEqual(self.fetch(server, DIGEST).read_bytes(), BLOB)
+
+    def test_truncated_file_is_not_adopted(self):
+        server = self.start()
+        (self.cache / "model.gguf").write_bytes(BLOB[:len(BLOB) // 3])
+        self.assertEqual(self.fetch(server).read_bytes(), BLOB)
+        self.assertTrue((self.cache / "blobs" / "sha256" / DIGEST).exists())
+        self.assertEqual(len(list((self.cache / "blobs" / "sha256").iterdir())), 1)
+
+    def test_complete_file_is_adopted(self):
+        server = self.start()
+        (self.cache / "model.gguf").write_bytes(BLOB)
+        self.assertEqual(self.fetch(server).read_bytes(), BLOB)
+        self.assertEqual([r for r in server.requests if r != "bytes=0-0"], [])
+
+    def test_remote_digest(self):
+        server = self.start()
+        self.assertEqual(ModelDownloader(self.cache).remote_digest(server.url()), DIGEST)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from server_log import ServerLog, rates
+
+# Verbatim llama-server output (tools/server/server.cpp) for two requests on slots 0 and 1 with a draft model loaded
+SPECULATIVE_LOG = """\
+srv  params_from_: Chat format: Content-only
+slot get_availabl: id  0 | task -1 | selected slot by lru, t_last = -1
+slot launch_slot_: id  0 | task 0 | processing task
+slot update_slots: id  0 | task 0 | new prompt, n_ctx_slot = 4096, n_keep = 0, n_prompt_tokens = 212
+slot update_slots: id  0 | task 0 | kv cache rm [0, end)
+slot update_slots: id  0 | task 0 | prompt processing progress, n_past = 212, n_tokens = 212, progress = 1.000000
+slot update_slots: id  0 | task 0 | prompt done, n_past = 212, n_tokens = 212
+slot print_timing: id  0 | task 0 |
+prompt eval time =     183.54 ms /   212 tokens (    0.87 ms per token,  1155.06 tokens per second)
+       eval time =     641.37 ms /    48 tokens (   13.36 ms per token,    74.84 tokens per second)
+      total time =     824.91 ms /   260 tokens
+slot print_timing: id  0 | task 0 |
+draft acceptance rate = 0.75862 (   33 accepted /    44 generated)
+slot      release: id  0 | task 0 | stop processing: n_past = 259, truncated = 0
+srv  update_slots: all slots are idle
+slot get_availabl: id  1 | task -1 | selected slot by lcs similarity, lcs_len = 180, similarity = 0.849 (> 0.100 thold)
+slot launch_slot_: id  1 | task 3 | processing task
+slot update_slots: id  1 | task 3 | new prompt, n_ctx_slot = 4096, n_keep = 0, n_prompt_tokens = 215
+slot update_slots: id  1 | task 3 | kv cache rm [180, end)
+slot print_timing: id  1 | task 3 |
+prompt eval time =      31.02 ms /    35 tokens (    0.89 ms per token,  1128.30 tokens per second)
+       eval time =     598.10 ms /    46 tokens (   13.00 ms per token,    76.91 tokens per second)
+      total time =     629.12 ms /    81 tokens
+slot print_timing: id  1 | task 3 |
+draft acceptance rate = 0.60000 (   27 accepted /    45 generated)
+slot      release: id  1 | task 3 | stop processing: n_past = 260, truncated = 0
+"""
+
+# Older builds logged the timings on the header line itself
+SINGLE_LINE_LOG = """\
+slot print_timing: id  0 | task 7 | prompt eval time =      10.00 ms /    20 tokens (    0.50 ms per token,  2000.00 tokens per second)
+slot print_timing: id  0 | task 7 |        eval time =     100.00 ms /    10 tokens (   10.00 ms per token,   100.00 tokens per second)
+"""
+
+def feed(text):
+    log = ServerLog()
+    for line in text.splitlines():
+        log.feed(line)
+    return log.snapshot()
+
+class ServerLogTest(unittest.TestCase):
+    def test_speculative_output(self):
+        metrics = feed(SPECULATIVE_LOG)
+        self.assertEqual(metrics["requests"], 2)
+        self.assertEqual(metrics["slots"], {"0": 1, "1": 1})
+        self.assertEqual((metrics["draft_accepted"], metrics["draft_generated"]), (60, 89))
+        self.assertEqual((metrics["prompt_tokens"], metrics["eval_tokens"]), (247, 94))
+        self.assertEqual((metrics["new_prompts"], metrics["prompt_total"], metrics["reused_tokens"]), (2, 427, 180))
+        self.assertEqual((metrics["select_lru"], metrics["select_similarity"]), (1, 1))
+        self.assertAlmostEqual(rates(metrics)["draft_accept"], 60 / 89)
+
+    def test_single_line_timings(self):
+        metrics = feed(SINGLE_LINE_LOG)
+        self.assertEqual(metrics["requests"], 1)
+        self.assertEqual(metrics["slots"], {"0": 1})
+        self.assertIsNone(rates(metrics)["draft_accept"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from stats import bootstrap
+
+class BootstrapTest(unittest.TestCase):
+    def test_pairing_is_explicit(self):
+        rng = random.Random(1)
+        difficulty = [rng.uniform(10, 100) for _ in range(200)]
+        baseline = [d + rng.gauss(0, 1) for d in difficulty]
+        candidate = [d * 1.05 + rng.gauss(0, 1) for d in difficulty]
+        _, paired_low, paired_high = bootstrap(baseline, candidate, "mean", paired=True)
+        # Equal lengths alone no longer imply pairing: unrelated samples keep their item-to-item spread
+        _, low, high = bootstrap(baseline, candidate, "mean")
+        self.assertLess(paired_high - paired_low, (high - low) / 5)
+        self.assertGreater(paired_low, 0)
+
+    def test_paired_lengths_must_match(self):
+        with self.assertRaises(ValueError):
+            bootstrap([1.0, 2.0], [1.0], "mean", paired=True)
+
+if __name__ == "__main__":
+    unittest.main()